@@ -0,0 +1,58 @@
+"""
+Bit primitives for bitboards.
+
+All of these work on python ints and lean on int.bit_length / int.bit_count, which run in C, so none of them loop
+over the 64 bits in python. Bitboards stored as numpy scalars have to be converted with int() first.
+
+Bit indices count from the least significant bit. Squares follow the rest of the board: square 0 is a8, square 63 is
+h1, and square n is bit 63-n, so the least significant set bit is the highest numbered square.
+"""
+
+
+def LSBIndex(bb):
+    """
+    index of the least significant set bit, -1 for an empty bitboard
+    """
+    return (bb & -bb).bit_length() - 1
+
+
+def MSBIndex(bb):
+    """
+    index of the most significant set bit, -1 for an empty bitboard
+    """
+    return bb.bit_length() - 1
+
+
+def PopCount(bb):
+    return bb.bit_count()
+
+
+def IsSingleBit(bb):
+    return bb != 0 and bb & (bb - 1) == 0
+
+
+def LSBSquare(bb):
+    return 63 - LSBIndex(bb)
+
+
+def MSBSquare(bb):
+    return 64 - bb.bit_length()
+
+
+def PopLSB(bb):
+    """
+    split off the least significant set bit, returns (its square, rest of bitboard)
+    """
+    lsb = bb & -bb
+
+    return 64 - lsb.bit_length(), bb ^ lsb
+
+
+def IterSquares(bb):
+    """
+    yield the square of every set bit, least significant bit first
+    """
+    while bb:
+        lsb = bb & -bb
+        yield 64 - lsb.bit_length()
+        bb ^= lsb
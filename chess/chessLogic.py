@@ -1,34 +1,39 @@
 import pygame
-from classicalBitboard import Board
-from moveGeneration import GenerateMoves
-import numpy as np
+from classicalBitboard import Board, CASTLING_RIGHTS, CASTLING_RIGHTS_MASK
 from piece import Piece
-from move import Move
+from undoRecord import UndoRecord, MAX_PLY
+from zobrist import ComputeHash, SIDE_KEY, CASTLING_KEYS, EPKey
+from moveGeneration import GenerateMoves
+from move import Move, KING_CASTLE, QUEEN_CASTLE, CAPTURE, EP_CAPTURE, PROMOTION, DOUBLE_PAWN_PUSH, MoveFrom, MoveTo, MoveFlag, PromotionPiece
 
 class ChessLogic:
-    def __init__(self, starting_fen="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"):
-        self.board = Board()
+    def __init__(self, starting_fen="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", backend="int", verify_hash=False):
+        self.board = Board(backend)
         self.ParseFen(starting_fen)
         self.board.FenToBitboards()
         self.board.SetUpBitboards()
         self.board.InitialiseBoard()
 
+        # debugging, check the incremental hash against a full recompute after every make/unmake
+        self.verify_hash = verify_hash
+
         self.moveGen = GenerateMoves(self.board)
         self.moveGen.PopulateAttackTables()
-        self.moveGen.PopulateRayTable()
 
-        self.is_checkmate = False
-        self.is_stalemate = False
-    
+        # the en-passant key needs the pawn attack tables
+        self.board.hash = ComputeHash(self.board, self.moveGen.PAWN_TABLE)
+
+
         self.clock = pygame.time.Clock()
 
         self.console_based_run = True
 
-        self.previous_possible_moves = []
-        self.attacked_squares = []
+        # one undo record per ply made, undo_ply is the number in use
+        self.undo_stack = [UndoRecord() for _ in range(MAX_PLY)]
+        self.undo_ply = 0
 
-        # populate initial set of possible moves
-        self.moveGen.GenerateAllPossibleMoves()
+        # legal moves are only generated when asked for, and kept until the next make/unmake
+        self.moves_stale = True
 
         # the piece that's being dragged by user
         self.drag_piece = None
@@ -38,21 +43,17 @@ class ChessLogic:
     def ParseFen(self, full_fen):
         self.board.position_fen, self.board.active_piece, self.board.castling_rights, self.board.en_passant, self.board.ply, self.board.moves = full_fen.split(' ')
 
+        self.board.castling_rights = sum(CASTLING_RIGHTS[right] for right in self.board.castling_rights if right != '-')
+
         if self.board.en_passant != '-':
             x = ord(self.board.en_passant[0])-97
             y = 8 - int(self.board.en_passant[1])
 
-            if y == 2:
-                # last move by black pawn 2 down
-                black_pawn = Piece('p', x + 8)
-                self.board.move_history.append(Move(black_pawn, black_pawn.square, black_pawn.square + 16, 'EP'))
-
-            elif y == 5:
-                # last move by white pawn 2 up
-                white_pawn = Piece('P', x + 48)
-                self.board.move_history.append(Move(white_pawn, white_pawn.square, white_pawn.square - 16, 'EP'))
+            # square the pawn that moved 2 passed over
+            self.board.ep_square = 8*y + x
 
         self.board.ply = int(self.board.ply)
+        self.board.halfmove_clock = self.board.ply
         self.board.moves = int(self.board.moves)
 
 
@@ -66,20 +67,104 @@ class ChessLogic:
 
         return f"{chr(x+97)}{8-y}"
 
-    def IsCheckmate(self):
-        king_can_move = len(list(filter(lambda move : move.piece == self.moveGen.ally_king, self.moveGen.possible_moves))) != 0
-        attacker_attacked = all([sq in self.attacked_squares for sq in self.board.BBToSquares(self.board.attackers)])
+    def MoveToString(self, move):
+        """
+        e.g. e2e4, or e7e8Q for promotions. Must be called before the move is made
+        """
+        move_string = f"{self.NumbertoAlgebraic(MoveFrom(move))}{self.NumbertoAlgebraic(MoveTo(move))}"
+
+        if move & PROMOTION:
+            promotes_to = PromotionPiece(move)
+            move_string += promotes_to if self.board.active_piece == 'w' else promotes_to.lower()
+
+        return move_string
+
+    def DecodeMove(self, move):
+        """
+        build a Move object from an encoded move, for the UI
+        """
+        initial_sq, final_sq, flag = MoveFrom(move), MoveTo(move), MoveFlag(move)
+        piece = self.board.GetPieceOnSquare(initial_sq)
+
+        if flag == KING_CASTLE:
+            move_type = 'CK' if piece.colour == 'w' else 'Ck'
+        elif flag == QUEEN_CASTLE:
+            move_type = 'CQ' if piece.colour == 'w' else 'Cq'
+        elif flag == EP_CAPTURE:
+            move_type = 'EP'
+        elif flag & PROMOTION:
+            promotes_to = PromotionPiece(move)
+            move_type = promotes_to if piece.colour == 'w' else promotes_to.lower()
+        else:
+            move_type = '_'
+
+        return Move(piece, initial_sq, final_sq, move_type, move)
+
+    def GetDecodedMoves(self):
+        return [self.DecodeMove(move) for move in self.GetLegalMoves()]
+
+    def GetLegalMoves(self):
+        """
+        legal moves of the current position, generated on first use after a make/unmake
+        """
+        if self.moves_stale:
+            self.moveGen.GenerateAllPossibleMoves()
+            self.moves_stale = False
 
-        return (king_can_move == False and self.board.attackers != 0 and attacker_attacked == False and len(self.moveGen.possible_moves) == 0)
+        return self.moveGen.possible_moves
+
+    def CountLegalMoves(self):
+        if not self.moves_stale:
+            return len(self.moveGen.possible_moves)
+
+        return self.moveGen.CountLegalMoves()
+
+    def GetCaptures(self):
+        return self.moveGen.GenerateCaptures()
+
+    def GetQuiets(self):
+        return self.moveGen.GenerateQuiets()
+
+    def GetQuietChecks(self):
+        return self.moveGen.GenerateQuietChecks()
+
+    def GivesCheck(self, move):
+        """
+        does the legal move move give check, in the current position
+        """
+        if self.moveGen.filters_stale:
+            self.moveGen.SetUpMoveFilters()
+
+        return self.moveGen.GivesCheck(move)
+
+    def StaticExchange(self, move, piece_values):
+        """
+        material the capture move wins once the exchange on its square is played out, in the current position
+        """
+        return self.moveGen.StaticExchange(move, piece_values)
+
+    def InCheck(self):
+        """
+        is the side to move in check, without generating its moves
+        """
+        if self.moveGen.filters_stale:
+            self.moveGen.SetUpMoveFilters()
+
+        return self.board.attackers != 0
+
+    def IsCheckmate(self):
+        return len(self.GetLegalMoves()) == 0 and self.board.attackers != 0
 
     def IsStalemate(self):
-        return len(self.moveGen.possible_moves) == 0 and self.board.attackers == 0
-    
-    def SetAttackedSquares(self):
-        self.attacked_squares = []
+        return len(self.GetLegalMoves()) == 0 and self.board.attackers == 0
+
+    @property
+    def is_checkmate(self):
+        return self.IsCheckmate()
 
-        for move in self.moveGen.possible_moves:
-            self.attacked_squares.append(move.dest)
+    @property
+    def is_stalemate(self):
+        return self.IsStalemate()
 
     def SwitchActivePiece(self):
         if self.board.active_piece == "w":
@@ -87,307 +172,246 @@ class ChessLogic:
         else:
             self.board.active_piece = "w"
 
+    def MoveRook(self, from_sq, to_sq):
+        rook = self.board.GetPieceOnSquare(from_sq)
 
-    def MakeMove(self, move):
-        """
-        move structure -> piece_name, initial_sq, final_sq, move_type
+        self.board.MovePiece(rook.name, from_sq, to_sq)
+        self.board.ClearSquare(from_sq)
+        self.board.PlacePiece(rook, to_sq)
+        rook.square = to_sq
 
-        P, 52, 36, _  (normal move)
-        P, 13, 5, Q (promotion move to white queen)
-        P, 18, 11, EP (pawn capture by en-passant)
-        K, 60, 62, CK (white king kingside castle)
-        K, 60, 57, CQ (white king queenside castle)
+        return rook
 
-        move[3] will change from _ to piece object of captured piece if 
-        captures happens
+    def MakeMove(self, move):
         """
-        piece, initial_sq, final_sq, move_type = move.piece, move.initial, move.dest, move.type
-        
-        self.board.move_history.append(move)
+        move is a 16-bit encoded move, see move.py
 
-        # remove piece from initial square
-        drag_piece_bitboard = self.board.GetBitboard(piece.name)
-        drag_piece_bitboard &= ~self.board.SquareToBB(initial_sq)
-        self.board.SetBitboard(piece.name, drag_piece_bitboard)
-
-        if self.board.IsSquareOccupied(final_sq) == True:
-            # remove captured piece from final square
-            captured_piece = self.board.GetPieceOnSquare(final_sq)
-            captured_piece_bitboard = self.board.GetBitboard(captured_piece.name)
-            captured_piece_bitboard &= ~self.board.SquareToBB(final_sq)
-            self.board.SetBitboard(captured_piece.name, captured_piece_bitboard)
+        e2e4 -> 52 << 6 | 36 | DOUBLE_PAWN_PUSH
+        e7e8=Q -> 12 << 6 | 4 | QUEEN_PROMO
+        e1g1 -> 60 << 6 | 62 | KING_CASTLE
 
-            self.board.pieces.remove(captured_piece)
+        anything the move can't restore by itself is saved in an undo record so that the move can be undone
+        """
+        initial_sq, final_sq, flag = (move >> 6) & 63, move & 63, move & 0xf000
 
-            # set captured piece
-            self.board.move_history[-1].captured_piece = captured_piece
-            #self.board.move_history[-1] = self.board.move_history[-1][:3] + (captured_piece,)
+        piece = self.board.GetPieceOnSquare(initial_sq)
 
-        else:
-            if move_type == 'EP' and piece.name in ['P', 'p']:
-                # en-passant capture
+        # whether the en-passant right is hashed depends on the pawns before the move
+        ep_key = EPKey(self.board, self.moveGen.PAWN_TABLE)
 
-                captured_piece = None
+        record = self.SaveState()
         
-                if piece.name == 'P':
-                    # white pawn performs EP capture, black pawn is below final square
-                    captured_piece = self.board.GetPieceOnSquare(final_sq + 8)
-
-                elif piece.name == 'p':
-                    # black pawn performs EP capture, white pawn is above final square
-                    captured_piece = self.board.GetPieceOnSquare(final_sq - 8)
-                
-                # remove captured piece from square
-                captured_piece_bitboard = self.board.GetBitboard(captured_piece.name)
-                captured_piece_bitboard &= ~self.board.SquareToBB(captured_piece.square)
-                self.board.SetBitboard(captured_piece.name, captured_piece_bitboard)
-
-                self.board.pieces.remove(captured_piece)
-
-                self.board.move_history[-1].captured_piece = captured_piece
-
-        if move_type != '_' and move_type != 'EP' and 'C' not in move_type:
-            # promotion, set bitboard of move type parameter, which is the piece we want to promote to
-            promotion_piece_bitboard = self.board.GetBitboard(move_type)
-            promotion_piece_bitboard |= self.board.SquareToBB(final_sq)
-            self.board.SetBitboard(move_type, promotion_piece_bitboard)
-
-            # change piece's name and square, increased times moved
-            piece.name = move_type
-            piece.square = final_sq
-            piece.times_moved += 1
-            #piece.promoted = True
-            self.board.move_history[-1].is_promotion_move = True
-        
-        else:
-            # move piece to final square in its bitboard
-            drag_piece_bitboard = self.board.GetBitboard(piece.name)
-            drag_piece_bitboard |= self.board.SquareToBB(final_sq)
-            self.board.SetBitboard(piece.name, drag_piece_bitboard)
+        self.board.move_history.append(move)
 
-            # change piece's square, set has moved to true
-            piece.square = final_sq
-            piece.times_moved += 1
+        # remove piece from initial square
+        self.board.TogglePiece(piece.name, initial_sq)
+        self.board.ClearSquare(initial_sq)
 
-            # perform rook movement for castling move
-            if move_type == 'CK':
-                rook = self.board.GetPieceOnSquare(63)
-                new_rook_position = initial_sq + 1
+        captured_piece = None
 
-                self.board.white_rooks &= ~self.board.SquareToBB(rook.square)
-                self.board.white_rooks |= self.board.SquareToBB(new_rook_position)
+        if flag == EP_CAPTURE:
+            # white pawn performs EP capture, black pawn is below final square and vice versa
+            captured_piece = self.board.GetPieceOnSquare(final_sq + 8 if piece.name == 'P' else final_sq - 8)
 
-                rook.square = new_rook_position
-                rook.times_moved += 1
+            self.board.ClearSquare(captured_piece.square)
 
-                self.board.castling_rights = self.board.castling_rights.replace('K', '')             
+        elif flag & CAPTURE:
+            captured_piece = self.board.GetPieceOnSquare(final_sq)
 
-            elif move_type == 'CQ':
-                rook = self.board.GetPieceOnSquare(56)
-                new_rook_position = initial_sq - 2
+        if captured_piece is not None:
+            # remove captured piece from its square
+            self.board.TogglePiece(captured_piece.name, captured_piece.square)
+
+            self.board.pieces.remove(captured_piece)
 
-                self.board.white_rooks &= ~self.board.SquareToBB(rook.square)
-                self.board.white_rooks |= self.board.SquareToBB(new_rook_position)
+            record.captured_piece = captured_piece.name
 
-                rook.square = new_rook_position
-                rook.times_moved += 1
+        if captured_piece is not None or piece.name == 'P' or piece.name == 'p':
+            self.board.halfmove_clock = 0
+        else:
+            self.board.halfmove_clock += 1
 
-                self.board.castling_rights = self.board.castling_rights.replace('Q', '')
+        if flag & PROMOTION:
+            # the pawn is replaced by the piece we want to promote to
+            promotes_to = PromotionPiece(move)
+            self.board.pieces.remove(piece)
+            piece = Piece(promotes_to if piece.colour == 'w' else promotes_to.lower(), final_sq)
+            self.board.pieces.append(piece)
 
-            elif move_type == 'Ck':
-                rook = self.board.GetPieceOnSquare(7)
-                new_rook_position = initial_sq + 1
+        # move piece to final square in its bitboard
+        self.board.TogglePiece(piece.name, final_sq)
 
-                self.board.black_rooks &= ~self.ooard.SquareToBB(rook.square)
-                self.board.black_rooks |= self.board.SquareToBB(new_rook_position)
+        piece.square = final_sq
+        self.board.PlacePiece(piece, final_sq)
 
-                rook.square = new_rook_position
-                rook.times_moved += 1
+        # perform rook movement for castling move
+        if flag == KING_CASTLE:
+            self.MoveRook(initial_sq + 3, initial_sq + 1)
 
-                self.board.castling_rights = self.board.castling_rights.replace('k', '')
+        elif flag == QUEEN_CASTLE:
+            self.MoveRook(initial_sq - 4, initial_sq - 1)
 
-            elif move_type == 'Cq':
-                rook = self.board.GetPieceOnSquare(0)
-                new_rook_position = initial_sq - 2
+        # pieces were hashed in and out as they moved, the rest of the state is hashed here
+        self.board.hash ^= CASTLING_KEYS[self.board.castling_rights] ^ ep_key ^ SIDE_KEY
 
-                self.board.black_rooks &= ~self.board.SquareToBB(rook.square)
-                self.board.black_rooks |= self.board.SquareToBB(new_rook_position)
+        self.board.castling_rights &= CASTLING_RIGHTS_MASK[initial_sq] & CASTLING_RIGHTS_MASK[final_sq]
 
-                rook.square = new_rook_position
-                rook.times_moved += 1
+        self.board.ep_square = (initial_sq + final_sq) // 2 if flag == DOUBLE_PAWN_PUSH else None
 
-                self.board.castling_rights = self.board.castling_rights.replace('q', '')
+        self.board.hash ^= CASTLING_KEYS[self.board.castling_rights]
                             
         self.board.ply += 1
         self.board.moves = self.board.ply // 2
 
-        # after move is made, bitboards have changed, so update all bitboard variables. 
-        # update ascii board, this is used for rendering
-        self.board.SetUpBitboards()
-        self.board.UpdateBoard()
-
         self.SwitchActivePiece()
 
-        self.previous_possible_moves.append(self.moveGen.possible_moves)
-        self.moveGen.GenerateAllPossibleMoves()   
+        # a new en-passant right only counts if the side now to move can use it
+        if flag == DOUBLE_PAWN_PUSH:
+            self.board.hash ^= EPKey(self.board, self.moveGen.PAWN_TABLE)
 
-        self.SetAttackedSquares()
+        self.moves_stale = True
+        self.moveGen.filters_stale = True
 
-        if self.IsCheckmate():
-            self.dragging = False
-            self.is_checkmate = True
+        if self.verify_hash:
+            self.VerifyHash()
 
-        if self.IsStalemate():
-            self.dragging = False
-            self.is_stalemate = True
+    def VerifyHash(self):
+        expected = ComputeHash(self.board, self.moveGen.PAWN_TABLE)
 
+        if self.board.hash != expected:
+            raise AssertionError(f"incremental hash {self.board.hash:016x} != {expected:016x} after {[self.MoveToString(m) for m in self.board.move_history]}")
 
-    def UnmakeMove(self):
+    def MakeNullMove(self):
         """
-        revert move at top of move history list
-        
-        - subtract ply and moves
-        - if castling move, add castling type to castling rights 
+        pass the turn without moving, for null-move pruning. Must not be made in check
         """
-        if len(self.previous_possible_moves) >= 1:
-            past_move = self.board.move_history.pop()
-            piece, initial_sq, final_sq, move_type, is_promotion_move = past_move.piece, past_move.initial, past_move.dest, past_move.type, past_move.is_promotion_move
-
-            if past_move.captured_piece != None:
-                # remove from final square
-                drag_piece_bitboard = self.board.GetBitboard(piece.name)
-                drag_piece_bitboard &= ~self.board.SquareToBB(final_sq)
-
-                if is_promotion_move:
-                    # set bitboard of the piece that was promoted to, to register
-                    # removal of piece from final square
-                    self.board.SetBitboard(piece.name, drag_piece_bitboard)
-
-                    piece.name = 'P' if piece.name.isupper() else 'p'
-                    piece.square = initial_sq
-                    piece.times_moved -= 1
-                    #piece.promoted = False
-
-                    # set bitboard of pawn and set it with initial square
-                    drag_piece_bitboard = self.board.GetBitboard(piece.name)
-                    drag_piece_bitboard |= self.board.SquareToBB(initial_sq)
-                else:
-                    drag_piece_bitboard |= self.board.SquareToBB(initial_sq)
-
-                # set bitboard of drag piece to be in initial square
-                self.board.SetBitboard(piece.name, drag_piece_bitboard)
+        self.SaveState()
 
-                # captures move happened, so restore captured piece
-                captured_piece_bitboard = self.board.GetBitboard(past_move.captured_piece.name)
-                captured_piece_bitboard |= self.board.SquareToBB(past_move.captured_piece.square)
-                self.board.SetBitboard(past_move.captured_piece.name, captured_piece_bitboard)
+        # the en-passant right lapses as if a move had been made
+        self.board.hash ^= EPKey(self.board, self.moveGen.PAWN_TABLE) ^ SIDE_KEY
+        self.board.ep_square = None
+        self.board.halfmove_clock += 1
 
-                self.board.pieces.append(past_move.captured_piece)
+        self.board.ply += 1
+        self.board.moves = self.board.ply // 2
+        self.SwitchActivePiece()
 
-                piece.square = initial_sq
-                piece.times_moved -= 1
+        self.moves_stale = True
+        self.moveGen.filters_stale = True
 
-            elif move_type != '_' and move_type != 'EP' and 'C' not in move_type:
-                # must be promotion move, without captures
+        if self.verify_hash:
+            self.VerifyHash()
 
-                # remove promoted piece from final square
-                drag_piece_bitboard = self.board.GetBitboard(piece.name)
-                drag_piece_bitboard &= ~self.board.SquareToBB(final_sq)
+    def UnmakeNullMove(self):
+        self.undo_ply -= 1
+        record = self.undo_stack[self.undo_ply]
 
-                # set bitboard of the piece that the pawn promoted to, to register
-                # remove of piece from final square
-                self.board.SetBitboard(piece.name, drag_piece_bitboard)
+        self.RestoreState(record)
 
-                piece.name = 'P' if piece.name.isupper() else 'p'
-                piece.square = initial_sq
-                piece.times_moved -= 1
-                piece.promoted = False
+    def SaveState(self):
+        """
+        push an undo record holding everything make/unmake can't work out from the move itself
+        """
+        record = self.PushUndoRecord()
+        record.castling_rights = self.board.castling_rights
+        record.ep_square = self.board.ep_square
+        record.halfmove_clock = self.board.halfmove_clock
+        # keep generated moves so unmake doesn't have to generate them again
+        record.possible_moves = None if self.moves_stale else self.moveGen.possible_moves
+        record.attackers = self.board.attackers
+        record.hash = self.board.hash
+        record.captured_piece = None
+
+        return record
+
+    def RestoreState(self, record):
+        """
+        put back the state saved by SaveState and step back a ply, once the pieces are back where they were
+        """
+        self.board.castling_rights = record.castling_rights
+        self.board.ep_square = record.ep_square
+        self.board.halfmove_clock = record.halfmove_clock
+        self.board.hash = record.hash
 
-                # set bitboard of pawn and set it with initial square
-                drag_piece_bitboard = self.board.GetBitboard(piece.name)
-                drag_piece_bitboard |= self.board.SquareToBB(initial_sq)
-                self.board.SetBitboard(piece.name, drag_piece_bitboard)
+        self.board.ply -= 1
+        self.board.moves = self.board.ply // 2
+        self.SwitchActivePiece()
 
-            else:
-                # must be normal move, movement with no captures, or castling
+        self.moveGen.filters_stale = True
 
-                # move drag piece back to initial square
-                drag_piece_bitboard = self.board.GetBitboard(piece.name)
-                drag_piece_bitboard |= self.board.SquareToBB(initial_sq)
+        if record.possible_moves is not None:
+            self.moveGen.possible_moves = record.possible_moves
+            self.moveGen.ally_king = self.moveGen.GetAllyKing()
+            self.board.attackers = record.attackers
+            self.moves_stale = False
 
-                # remove drag piece from final square
-                drag_piece_bitboard &= ~self.board.SquareToBB(final_sq)
+            record.possible_moves = None
+        else:
+            self.moves_stale = True
 
-                self.board.SetBitboard(piece.name, drag_piece_bitboard)
+        if self.verify_hash:
+            self.VerifyHash()
 
-                piece.square = initial_sq
-                piece.times_moved -= 1
+    def PushUndoRecord(self):
+        if self.undo_ply == len(self.undo_stack):
+            # game went on longer than MAX_PLY
+            self.undo_stack.append(UndoRecord())
 
-                # if castling move, move rook back to where it has to be, and revert castlng rights
+        record = self.undo_stack[self.undo_ply]
+        self.undo_ply += 1
 
-                if move_type == 'CK':
-                    new_rook_position = initial_sq + 1
-                    rook = self.board.GetPieceOnSquare(new_rook_position)
-                
-                    self.board.white_rooks &= ~self.board.SquareToBB(new_rook_position)
-                    self.board.white_rooks |= self.board.SquareToBB(63)
+        return record
 
-                    rook.square = 63
-                    rook.times_moved -= 1
+    def UnmakeMove(self):
+        """
+        revert move at top of move history list, restoring everything else from its undo record
+        """
+        if self.undo_ply >= 1:
+            move = self.board.move_history.pop()
 
-                    self.board.castling_rights += 'K'            
+            self.undo_ply -= 1
+            record = self.undo_stack[self.undo_ply]
 
-                elif move_type == 'CQ':
-                    new_rook_position = initial_sq - 2
-                    rook = self.board.GetPieceOnSquare(new_rook_position)
-                
-                    self.board.white_rooks &= ~self.board.SquareToBB(new_rook_position)
-                    self.board.white_rooks |= self.board.SquareToBB(56)
+            initial_sq, final_sq, flag = (move >> 6) & 63, move & 63, move & 0xf000
 
-                    rook.square = 56
-                    rook.times_moved -= 1
+            piece = self.board.GetPieceOnSquare(final_sq)
 
-                    self.board.castling_rights += 'Q'       
+            # remove piece from final square
+            self.board.TogglePiece(piece.name, final_sq)
 
-                elif move_type == 'Ck':
-                    new_rook_position = initial_sq + 1
-                    rook = self.board.GetPieceOnSquare(new_rook_position)
-                
-                    self.board.black_rooks &= ~self.board.SquareToBB(new_rook_position)
-                    self.board.black_rooks |= self.board.SquareToBB(7)
+            if flag & PROMOTION:
+                # promoted piece turns back into a pawn
+                self.board.pieces.remove(piece)
+                piece = Piece('P' if piece.colour == 'w' else 'p', initial_sq)
+                self.board.pieces.append(piece)
 
-                    rook.square = 7
-                    rook.times_moved -= 1
+            # move drag piece back to initial square
+            self.board.TogglePiece(piece.name, initial_sq)
 
-                    self.board.castling_rights += 'k'    
+            piece.square = initial_sq
 
-                elif move_type == 'Cq':
-                    new_rook_position = initial_sq - 2
-                    rook = self.board.GetPieceOnSquare(new_rook_position)
-                
-                    self.board.black_rooks &= ~self.board.SquareToBB(new_rook_position)
-                    self.board.black_rooks |= self.board.SquareToBB(0)
+            self.board.ClearSquare(final_sq)
+            self.board.PlacePiece(piece, initial_sq)
 
-                    rook.square = 0
-                    rook.times_moved -= 1
+            if record.captured_piece is not None:
+                # captures move happened, so restore captured piece
+                if flag == EP_CAPTURE:
+                    captured_sq = final_sq + 8 if piece.colour == 'w' else final_sq - 8
+                else:
+                    captured_sq = final_sq
 
-                    self.board.castling_rights += 'q'    
-                
-            self.board.ply -= 1
-            self.board.moves -= 1 # ?
-            self.SwitchActivePiece()
+                captured_piece = Piece(record.captured_piece, captured_sq)
 
-            self.moveGen.ally_king = self.moveGen.GetAllyKing()
-            self.moveGen.GetAttackers()
+                self.board.TogglePiece(captured_piece.name, captured_sq)
 
-            self.is_checkmate = False
-            self.is_stalemate = False
-        
-            self.board.SetUpBitboards()
-            self.board.UpdateBoard()
+                self.board.pieces.append(captured_piece)
+                self.board.PlacePiece(captured_piece, captured_sq)
 
-            self.moveGen.possible_moves = self.previous_possible_moves.pop()
+            # if castling move, move rook back to where it has to be
+            if flag == KING_CASTLE:
+                self.MoveRook(initial_sq + 1, initial_sq + 3)
 
-            self.SetAttackedSquares()
-    
+            elif flag == QUEEN_CASTLE:
+                self.MoveRook(initial_sq - 1, initial_sq - 4)
 
+            self.RestoreState(record)
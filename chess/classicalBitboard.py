@@ -1,60 +1,113 @@
 import numpy as np
 from piece import Piece
-import math
+from bitOperations import LSBIndex, MSBIndex, PopCount, IterSquares
+from zobrist import PIECE_KEYS
+
+MASK_64 = (2**64) - 1
+
+# scalar type used to store bitboards. Python ints are much cheaper to operate on than numpy scalars, numpy is kept
+# as an alternative for comparison
+BACKENDS = {'int': int, 'numpy': np.uint64}
+
+# castling rights are kept as 4 bits
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+CASTLING_RIGHTS = {'K': WHITE_KINGSIDE, 'Q': WHITE_QUEENSIDE, 'k': BLACK_KINGSIDE, 'q': BLACK_QUEENSIDE}
+
+# rights kept by a move that starts or ends on each square. Moving a king or a rook, or capturing a rook on its
+# starting square, loses the matching rights
+CASTLING_RIGHTS_MASK = [15] * 64
+CASTLING_RIGHTS_MASK[0] = 15 & ~BLACK_QUEENSIDE
+CASTLING_RIGHTS_MASK[4] = 15 & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_RIGHTS_MASK[7] = 15 & ~BLACK_KINGSIDE
+CASTLING_RIGHTS_MASK[56] = 15 & ~WHITE_QUEENSIDE
+CASTLING_RIGHTS_MASK[60] = 15 & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_RIGHTS_MASK[63] = 15 & ~WHITE_KINGSIDE
+
+# piece bitboards are kept in one list, indexed by piece code. White pieces are 0-5, black pieces 6-11, so code // 6
+# is the colour index
+PIECE_NAMES = 'PNBRQKpnbrqk'
+PIECE_CODES = {name: code for code, name in enumerate(PIECE_NAMES)}
+WHITE, BLACK = 0, 1
+
+def BitboardProperty(code):
+    """
+    named access to one of the piece bitboards, e.g. board.white_pawns
+    """
+    def Get(self):
+        return self.bitboards[code]
+
+    def Set(self, bb):
+        self.bitboards[code] = bb
+
+    return property(Get, Set)
 
 class Board:
-    def __init__(self):
-        # bitboards
-        self.all_whites = 0
-        self.all_blacks = 0
-        self.white_bishops = 0
-        self.white_rooks = 0
-        self.white_bishops = 0
-        self.white_rooks = 0
-        self.white_king = 0
-        self.white_queen = 0
-        self.white_pawns = 0
-        self.black_rooks = 0
-        self.black_knights = 0
-        self.black_bishops = 0
-        self.black_king = 0
-        self.black_queen = 0
-        self.black_pawns = 0
-        self.occupied = 0
-        self.empty = 0
+    white_pawns = BitboardProperty(PIECE_CODES['P'])
+    white_knights = BitboardProperty(PIECE_CODES['N'])
+    white_bishops = BitboardProperty(PIECE_CODES['B'])
+    white_rooks = BitboardProperty(PIECE_CODES['R'])
+    white_queen = BitboardProperty(PIECE_CODES['Q'])
+    white_king = BitboardProperty(PIECE_CODES['K'])
+    black_pawns = BitboardProperty(PIECE_CODES['p'])
+    black_knights = BitboardProperty(PIECE_CODES['n'])
+    black_bishops = BitboardProperty(PIECE_CODES['b'])
+    black_rooks = BitboardProperty(PIECE_CODES['r'])
+    black_queen = BitboardProperty(PIECE_CODES['q'])
+    black_king = BitboardProperty(PIECE_CODES['k'])
+
+    def __init__(self, backend='int'):
+        self.backend = backend
+        self.U64 = BACKENDS[backend]
+
+        # bitboards, one per piece code
+        self.bitboards = [self.U64(0)] * 12
+        # pieces of each colour, kings included
+        self.colour_occupancy = [self.U64(0)] * 2
+        self.occupied = self.U64(0)
+
+        self.hash = 0 # zobrist key of the position, see zobrist.py
 
         self.attackers = 0 # bitboard of pieces giving check
-        self.king_danger_squares = np.uint64(0)
 
-        self.CENTRE = np.uint64(103481868288)
-        self.EXTENDED_CENTRE = np.uint64(66229406269440)
-        self.A_FILE = np.uint64(9259542123273814144)
-        self.H_FILE = np.uint64(72340172838076673)
+        self.CENTRE = self.U64(103481868288)
+        self.EXTENDED_CENTRE = self.U64(66229406269440)
+        self.A_FILE = self.U64(9259542123273814144)
+        self.H_FILE = self.U64(72340172838076673)
 
-        self.FILES = {1 : self.A_FILE, 2 : np.uint64(4629771061636907072), 3 : np.uint64(2314885530818453536), 4 : np.uint64(1157442765409226768),
-                      5 : np.uint64(578721382704613384), 6 : np.uint64(289360691352306692), 7 : np.uint64(144680345676153346), 8 : self.H_FILE}
+        self.FILES = {1 : self.A_FILE, 2 : self.U64(4629771061636907072), 3 : self.U64(2314885530818453536), 4 : self.U64(1157442765409226768),
+                      5 : self.U64(578721382704613384), 6 : self.U64(289360691352306692), 7 : self.U64(144680345676153346), 8 : self.H_FILE}
 
         self.AB_FILE = self.FILES[1] | self.FILES[2]
         self.GH_FILE = self.FILES[7] | self.FILES[8]
 
-        self.RANKS = lambda rank_number : np.uint64(255 << (rank_number-1) * 8)
+        self.RANK_BBS = {rank_number : self.U64(255 << (rank_number-1) * 8) for rank_number in range(1, 9)}
+        self.RANKS = lambda rank_number : self.RANK_BBS[rank_number]
 
-        self.all_squares = [np.uint64(2**i) for i in range(64)]
+        self.all_squares = [self.U64(2**i) for i in range(64)]
+
+        # indexed by square, square 0 is the most significant bit
+        self.SQUARE_BBS = self.all_squares[::-1]
         
         # board_repr
         self.console_board = None
 
+        # piece on each square, or None. Kept in sync with the bitboards by make/unmake
+        self.mailbox = [None] * 64
+
         self.pieces = []
         self.move_history = []
 
         # from FEN
         self.position_fen = ''
         self.active_piece = ''
-        self.castling_rights = ''
+        self.castling_rights = 0
         self.en_passant = ''
         self.ply = ''
         self.moves = ''
 
+        self.ep_square = None # square behind a pawn that just moved 2, or None
+        self.halfmove_clock = 0 # plies since the last pawn move or capture
+
     def FenToBitboards(self):
         # bitboards setup
         bbs = {'P':['0']*64, 'N':['0']*64, 'B':['0']*64, 'R':['0']*64, 'Q':['0']*64, 'K':['0']*64, 'p':['0']*64, 'n':['0']*64, 'b':['0']*64, 'r':['0']*64, 'q':['0']*64, 'k':['0']*64}
@@ -82,7 +135,7 @@ class Board:
 
             bit_board = int(binary, 2)
 
-            bit_board = np.uint64(bit_board)
+            bit_board = self.U64(bit_board)
 
             self.SetBitboard(p_type, bit_board)
 
@@ -104,25 +157,35 @@ class Board:
             print(line)
 
     def UpdateBoard(self):
+        """
+        rebuild the ascii board from the piece list. Make and unmake keep it up to date square by square, so this is
+        only needed if the piece list was changed directly
+        """
         self.console_board = ['.'] * 64
 
         for piece in self.pieces:
             self.console_board[piece.square] = piece.name
 
+    def PlacePiece(self, piece, square):
+        self.mailbox[square] = piece
+        self.console_board[square] = piece.name
+
+    def ClearSquare(self, square):
+        self.mailbox[square] = None
+        self.console_board[square] = '.'
+
     def InitialiseBoard(self):
         self.pieces = []
+        self.mailbox = [None] * 64
         # for rendering
         self.console_board = ['.'] * 64
-        piece_str = {self.white_pawns: 'P', self.white_knights: 'N', self.white_bishops: 'B',
-                          self.white_rooks: 'R', self.white_queen: 'Q', self.white_king: 'K', self.black_pawns: 'p',
-                          self.black_knights: 'n', self.black_bishops: 'b', self.black_rooks: 'r',
-                          self.black_queen: 'q', self.black_king: 'k'}
 
+        for code, string in enumerate(PIECE_NAMES):
+            for sq in self.BBToSquares(self.bitboards[code]):
+                piece = Piece(string, sq)
 
-        for bb, string in piece_str.items():
-            for sq in self.BBToSquares(bb):
-                self.console_board[sq] = string
-                self.pieces.append(Piece(string, sq))
+                self.PlacePiece(piece, sq)
+                self.pieces.append(piece)
 
     def PrintAllBitboards(self):
         for piece_type in ['R', 'N', 'B', 'Q', 'K', 'r', 'n', 'b', 'q', 'k', 'P', 'p']:
@@ -134,8 +197,6 @@ class Board:
         if size == "S":
             print(' ________')
             for r_ind, rank in enumerate([self.console_board[i:i + 8] for i in range(0, 64, 8)]):
-                self.console_board += rank
-
                 print('|' + ''.join(rank) + f'|{8 - r_ind}')
 
                 if r_ind == 7:
@@ -143,7 +204,6 @@ class Board:
         else:
            for r_ind, rank in enumerate([self.console_board[i:i + 8] for i in range(0, 64, 8)]):
                 print(" +---+---+---+---+---+---+---+---+")
-                self.console_board += rank
 
                 print(f'{8 - r_ind}| ' + ' | '.join(rank) + ' |')
 
@@ -152,111 +212,91 @@ class Board:
                     print('   ' + '   '.join([chr(97+i) for i in range(8)]) + '  ')
 
     def SetBitboard(self, p_type, bb):
-        if p_type == 'P':
-            self.white_pawns = bb
-        elif p_type == 'R':
-            self.white_rooks = bb
-        elif p_type == 'N':
-            self.white_knights = bb
-        elif p_type == 'K':
-            self.white_king = bb
-        elif p_type == 'Q':
-            self.white_queen = bb
-        elif p_type == 'B':
-            self.white_bishops = bb
-        elif p_type == 'p':
-            self.black_pawns = bb
-        elif p_type == 'r':
-            self.black_rooks = bb
-        elif p_type == 'n':
-            self.black_knights = bb
-        elif p_type == 'k':
-            self.black_king = bb
-        elif p_type == 'q':
-            self.black_queen = bb
-        elif p_type == 'b':
-            self.black_bishops = bb
+        # aggregates aren't updated, call SetUpBitboards after
+        self.bitboards[PIECE_CODES[p_type]] = bb
             
     def GetBitboard(self, p_type):
-        if p_type == 'P':
-            return self.white_pawns
-        elif p_type == 'R':
-            return self.white_rooks
-        elif p_type == 'N':
-            return self.white_knights
-        elif p_type == 'K':
-            return self.white_king 
-        elif p_type == 'Q':
-            return self.white_queen
-        elif p_type == 'B':
-            return self.white_bishops
-        elif p_type == 'p':
-            return self.black_pawns
-        elif p_type == 'r':
-            return self.black_rooks
-        elif p_type == 'n':
-            return self.black_knights
-        elif p_type == 'k':
-            return self.black_king 
-        elif p_type == 'q':
-            return self.black_queen 
-        elif p_type == 'b':
-            return self.black_bishops
+        return self.bitboards[PIECE_CODES[p_type]]
+
+    def TogglePiece(self, p_type, square):
+        """
+        put a piece on square, or take it off. The colour and total occupancy are XORed along with the piece's
+        bitboard, so they never have to be rebuilt during make/unmake. The piece's zobrist key goes in or out of the hash
+        the same way
+        """
+        code = PIECE_CODES[p_type]
+        bb = self.SQUARE_BBS[square]
+
+        self.bitboards[code] ^= bb
+        self.colour_occupancy[code // 6] ^= bb
+        self.occupied ^= bb
+
+        self.hash ^= PIECE_KEYS[code][square]
+
+    def MovePiece(self, p_type, from_sq, to_sq):
+        code = PIECE_CODES[p_type]
+        bb = self.SQUARE_BBS[from_sq] | self.SQUARE_BBS[to_sq]
 
+        self.bitboards[code] ^= bb
+        self.colour_occupancy[code // 6] ^= bb
+        self.occupied ^= bb
+
+        self.hash ^= PIECE_KEYS[code][from_sq] ^ PIECE_KEYS[code][to_sq]
 
     def SetUpBitboards(self):
-        # do not consider kings to prevent illegal captures
-        self.all_whites = self.white_pawns | self.white_rooks | self.white_bishops | self.white_queen | self.white_knights
-        self.all_blacks = self.black_pawns | self.black_rooks | self.black_bishops | self.black_queen | self.black_knights
+        """
+        rebuild the occupancy bitboards from the piece bitboards, after setting up a position
+        """
+        self.colour_occupancy = [self.U64(0)] * 2
+
+        for code, bb in enumerate(self.bitboards):
+            self.colour_occupancy[code // 6] |= bb
+
+        self.occupied = self.colour_occupancy[WHITE] | self.colour_occupancy[BLACK]
+
+    # do not consider kings to prevent illegal captures
+    @property
+    def all_whites(self):
+        return self.colour_occupancy[WHITE] ^ self.bitboards[PIECE_CODES['K']]
+
+    @property
+    def all_blacks(self):
+        return self.colour_occupancy[BLACK] ^ self.bitboards[PIECE_CODES['k']]
 
-        # occupied means there's any piece on the square therefore kings considered
-        self.occupied = self.all_blacks | self.all_whites | self.black_king | self.white_king
-        # empty is inverse of occupied
-        self.empty = ~ self.occupied
+    # empty is inverse of occupied
+    @property
+    def empty(self):
+        return ~ self.occupied & MASK_64
 
     @staticmethod
     def BitscanForward(n):
-        return np.uint64(int(np.binary_repr(n & -n), 2))
+        # least significant set bit, isolated
+        return 1 << LSBIndex(int(n))
 
     @staticmethod
     def BitscanReverse(n):
-        binary = bin(n)[2:][::-1]
-        index = binary.rindex('1')
-
-        return np.uint64(1) << np.uint64(index)
+        # most significant set bit, isolated
+        return 1 << MSBIndex(int(n))
 
     def BBToSquares(self, bb):
-        x = bb
-        squares = []
-
-        while(x != 0):
-            # isolate LSB
-            lsb = x & -x
-            trailing_zeros = int(math.log(lsb, 2))
-            squares.append(63 - trailing_zeros)
-            x &= ~lsb
-
-        return squares
+        return list(IterSquares(int(bb)))
     
     def CountPieces(self, piece_name):
-        return len(self.BBToSquares(self.GetBitboard(piece_name)))
+        return PopCount(int(self.GetBitboard(piece_name)))
 
     def GetPiecesOnBitboard(self, bb):
-        return [piece for sq in self.BBToSquares(bb) for piece in self.pieces if piece.square == sq]
+        return [self.mailbox[sq] for sq in self.BBToSquares(bb)]
 
     def GetPieceOnSquare(self, square):
-        if self.IsSquareOccupied(square):
-            return list(filter(lambda piece : piece.square == square, self.pieces))[0]
+        return self.mailbox[square]
 
     def SquareToBB(self, square):
-        bit_pos = 63-square
-
-        return np.uint64(2**bit_pos)
+        return self.SQUARE_BBS[square]
 
     def IsSquareOccupied(self, square):
         square_mask = self.SquareToBB(square)
 
-        if square_mask & self.occupied == np.uint64(0):
+        if square_mask & self.occupied == 0:
             return False
         else:
             return True
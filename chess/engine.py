@@ -1,38 +1,256 @@
 from chessLogic import ChessLogic
+from classicalBitboard import BACKENDS
+from concurrent.futures import ProcessPoolExecutor
 import time
 import random
 from evaluation import Evaluation
+from move import PROMOTION, EP_CAPTURE, CAPTURE
+from moveOrdering import MoveOrdering
+from transpositionTable import TranspositionTable, PerftTable, EXACT, LOWER, UPPER
 import math
 
+# score for being mated at the root. Mates further away score closer to 0, so that the quickest mate is preferred
+MATE_SCORE = 100000
+# scores this close to MATE_SCORE are mates
+MATE_BOUND = MATE_SCORE - 1000
+
+MAX_DEPTH = 64
+# time and node limits are checked every this many nodes
+CHECK_INTERVAL = 1024
+# kept back from the clock to cover the time it takes to play the move
+MOVE_OVERHEAD = 0.05
+# half width of the first aspiration window around the last iteration's score, doubled on each fail
+ASPIRATION_WINDOW = 50
+# iterations shallower than this use the full window, their scores swing too much to aim at
+ASPIRATION_DEPTH = 4
+# null-move pruning is tried from this depth, and searched this much shallower than a normal move
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_REDUCTION = 2
+# deeper than this the null move is searched one ply shallower still
+NULL_MOVE_DEEP_DEPTH = 6
+# from this depth a null-move cutoff is checked by a reduced normal search, to catch zugzwang the pawn-only guard misses
+NULL_MOVE_VERIFY_DEPTH = 6
+# late move reductions apply from this depth, to quiet moves after this many moves have been searched
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+# quiescence skips captures that can't bring the score up to alpha even with this much to spare
+DELTA_MARGIN = 200
+
+# positions BenchmarkSearch uses by default
+BENCH_FENS = ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+              "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+              "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+              "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"]
+
+def ScoreToTT(score, ply):
+    """
+    mate scores are stored relative to the position, not the root, so they stay right when reached through another
+    line
+    """
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+def ScoreFromTT(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+# engines kept by each worker process, by fen, so that jobs from the same position don't set up a new board each time
+worker_engines = {}
+
+def PerftWorker(fen, prefix, depth, cache_mb=0):
+    """
+    perft of the position reached by playing the moves in prefix from fen. Runs in a worker process, which has to
+    rebuild the position as boards can't be shared between processes
+    """
+    if fen not in worker_engines:
+        engine = Engine(tt_size_mb=0)
+        engine.chess = ChessLogic(fen)
+
+        if cache_mb:
+            engine.perft_table = PerftTable(cache_mb)
+
+        worker_engines[fen] = engine
+
+    engine = worker_engines[fen]
+
+    for move in prefix:
+        engine.chess.MakeMove(move)
+
+    nodes = engine.Perft(depth, False)
+
+    for _ in prefix:
+        engine.chess.UnmakeMove()
+
+    return nodes
+
 class Engine:
-    def __init__(self):
+    def __init__(self, tt_size_mb=16):
         self.run = True
         self.chess = None
         self.evaluate = Evaluation()
         self.search_depth = 3
         self.best_move = None
-        self.move_scores = {}
+        self.tt = TranspositionTable(tt_size_mb)
+        self.ordering = MoveOrdering()
+
+        # selectivity, can be turned off to measure what it gains
+        self.use_null_move = True
+        self.use_lmr = True
+        self.SetReductions()
+
+        # search limits, set by BestMove
+        self.nodes = 0
+        self.qnodes = 0 # nodes searched by Quiescence, included in nodes
+        self.node_limit = None
+        self.start_time = 0
+        self.hard_deadline = None
+        self.stop = False
+
+        # triangular principal variation table, pv_table[ply] holds the best line from ply, pv_length[ply] where it ends
+        self.pv_table = [[0] * (MAX_DEPTH + 1) for _ in range(MAX_DEPTH + 1)]
+        self.pv_length = [0] * (MAX_DEPTH + 1)
+        self.pv = [] # principal variation of the last completed iteration
+
+        self.verbose = True # print a line for each completed iteration
+        self.iterations = [] # (depth, score, nodes, time, best move) of each completed iteration
+        self.perft_table = None # optional PerftTable, caches subtree counts reached by transposition
     
     def Perft(self, depth, root = True):
         if depth == 0:
             return 1
+        elif depth == 1 and not root:
+            # bulk count, each leaf is a legal move so there's no need to make them
+            return self.chess.CountLegalMoves()
         else:
+            # depth 1 is just the number of legal moves, not worth a table entry
+            cache = self.perft_table is not None and not root and depth > 1
+
+            if cache:
+                num_of_positions = self.perft_table.Probe(self.chess.board.hash, depth)
+
+                if num_of_positions is not None:
+                    return num_of_positions
+
             num_of_positions = 0
 
-            for move in self.chess.moveGen.possible_moves:
+            for move in self.chess.GetLegalMoves():
+                if root:
+                    move_string = self.chess.MoveToString(move)
+
                 self.chess.MakeMove(move)
                 p = self.Perft(depth - 1, False)
                 if root:
-                    if move.type not in ['Q', 'R', 'B', 'N', 'q', 'r', 'b', 'n']:
-                        print(f"{self.chess.NumbertoAlgebraic(move.initial)}{self.chess.NumbertoAlgebraic(move.dest)}: {p}")
-                    else:
-                        print(f"{self.chess.NumbertoAlgebraic(move.initial)}{self.chess.NumbertoAlgebraic(move.dest)}{move.type}: {p}")
+                    print(f"{move_string}: {p}")
 
                 num_of_positions += p
                 self.chess.UnmakeMove()
+
+            if cache:
+                self.perft_table.Store(self.chess.board.hash, depth, num_of_positions)
                 
             return num_of_positions
     
+    def SplitPoints(self, depth):
+        """
+        every line of depth moves from the current position, as tuples of moves. Lines that end in mate or stalemate
+        early have no nodes at the full depth, so they're left out
+        """
+        if depth == 0:
+            return [()]
+
+        lines = []
+
+        for move in self.chess.GetLegalMoves():
+            self.chess.MakeMove(move)
+            lines += [(move,) + line for line in self.SplitPoints(depth - 1)]
+            self.chess.UnmakeMove()
+
+        return lines
+
+    def ParallelPerft(self, fen, depth, workers=None, split_depth=1, cache_mb=0):
+        """
+        perft split across a process pool. Every line of split_depth moves is a job, so a higher split depth gives
+        more, smaller jobs to balance over the workers. Divide output and the total match a serial Perft
+        """
+        self.chess = ChessLogic(fen)
+        split_depth = min(split_depth, depth - 1)
+
+        if split_depth < 1:
+            return self.Perft(depth)
+
+        root_moves = list(self.chess.GetLegalMoves())
+        move_strings = [self.chess.MoveToString(move) for move in root_moves]
+        lines = self.SplitPoints(split_depth)
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            jobs = [(line[0], executor.submit(PerftWorker, fen, line, depth - split_depth, cache_mb)) for line in lines]
+
+            divide = dict.fromkeys(root_moves, 0)
+
+            for root_move, job in jobs:
+                divide[root_move] += job.result()
+
+        for move, move_string in zip(root_moves, move_strings):
+            print(f"{move_string}: {divide[move]}")
+
+        return sum(divide.values())
+
+    def BenchmarkBackends(self, fen, depth):
+        """
+        run the same perft on each bitboard backend and report nodes per second
+        """
+        results = {}
+
+        for backend in BACKENDS:
+            self.chess = ChessLogic(fen, backend)
+
+            start = time.time()
+            positions = self.Perft(depth, False)
+            time_taken = time.time() - start
+
+            results[backend] = positions / time_taken
+            print(f"{backend : >6} | Num of positions: {positions} | Time taken: {time_taken : .4f} seconds | Positions per second: {results[backend] : .4f}")
+
+        return results
+
+    def BenchmarkSearch(self, fens, depth):
+        """
+        search each fen to depth with null-move pruning and late move reductions on and off, and report nodes, time
+        and nodes per second for each combination
+        """
+        settings = self.use_null_move, self.use_lmr, self.verbose
+        self.verbose = False
+        results = {}
+
+        for use_null_move in (False, True):
+            for use_lmr in (False, True):
+                self.use_null_move, self.use_lmr = use_null_move, use_lmr
+                nodes, time_taken = 0, 0
+
+                for fen in fens:
+                    # start every search from nothing, so the runs are comparable
+                    self.chess = ChessLogic(fen)
+                    self.tt.Clear()
+                    self.ordering = MoveOrdering()
+
+                    start = time.time()
+                    self.BestMove(max_depth=depth)
+                    time_taken += time.time() - start
+                    nodes += self.nodes
+
+                results[(use_null_move, use_lmr)] = (nodes, time_taken)
+                print(f"null move {'on ' if use_null_move else 'off'} | lmr {'on ' if use_lmr else 'off'} | Nodes: {nodes} | Time taken: {time_taken : .4f} seconds | Nodes per second: {nodes / time_taken : .0f}")
+
+        self.use_null_move, self.use_lmr, self.verbose = settings
+
+        return results
+
     @staticmethod
     def ComparePerft():
         with open("../stockfish_output.txt", "r") as s:
@@ -66,7 +284,7 @@ class Engine:
         
         best_score = -math.inf
 
-        for move in self.chess.moveGen.possible_moves:
+        for move in self.chess.GetLegalMoves():
             self.chess.MakeMove(move)
 
             evaluation = -self.Search(depth - 1)
@@ -81,44 +299,364 @@ class Engine:
 
         return best_score
     
-    def AlphaBeta(self, depth, alpha, beta):
-        if depth == 0:
-            self.evaluate.board = self.chess.board
-            return self.evaluate.Evaluate()
-        
-        if self.chess.is_checkmate:
-            return -math.inf
-        elif self.chess.is_stalemate:
+    def SetReductions(self, base=0.75, divisor=2.25):
+        """
+        late move reduction for each depth and move number: base + ln(depth) * ln(move number) / divisor plies, the
+        later the move and the deeper the search, the more it's reduced
+        """
+        self.lmr_table = [[0] * 256 for _ in range(MAX_DEPTH + 1)]
+
+        for depth in range(1, MAX_DEPTH + 1):
+            for move_number in range(1, 256):
+                self.lmr_table[depth][move_number] = int(base + math.log(depth) * math.log(move_number) / divisor)
+
+    def HasNonPawnMaterial(self):
+        """
+        does the side to move have a piece other than pawns and king. Without one, zugzwang is common, and passing
+        the turn isn't a fair test of a position
+        """
+        board = self.chess.board
+
+        if board.active_piece == 'w':
+            return (board.white_knights | board.white_bishops | board.white_rooks | board.white_queen) != 0
+
+        return (board.black_knights | board.black_bishops | board.black_rooks | board.black_queen) != 0
+
+    def AlphaBeta(self, depth, alpha, beta, ply=0, allow_null=True):
+        """
+        negamax with alpha-beta pruning. Returns the score of the position for the side to move, exact if it lies
+        between alpha and beta, otherwise only a bound. Results go in the transposition table, and the best move at the
+        root is kept in self.best_move
+        """
+        if self.stop:
             return 0
 
-        for move in self.chess.moveGen.possible_moves:
+        self.nodes += 1
+        self.pv_length[ply] = ply
+
+        if ply > 0 and (self.nodes % CHECK_INTERVAL == 0 or self.node_limit is not None):
+            self.CheckLimits()
+
+        key = self.chess.board.hash
+        tt_move = 0
+        pv_node = beta - alpha > 1
+
+        entry = self.tt.Probe(key)
+
+        if entry is not None:
+            tt_depth, tt_score, tt_bound, tt_move = entry
+            tt_score = ScoreFromTT(tt_score, ply)
+
+            # the root always searches, so that it has a best move, and pv nodes do too, so the pv isn't cut short
+            if ply > 0 and not pv_node and tt_depth >= depth:
+                if tt_bound == EXACT or (tt_bound == LOWER and tt_score >= beta) or (tt_bound == UPPER and tt_score <= alpha):
+                    return tt_score
+
+        if depth == 0:
+            # the node was counted here, Quiescence counts it again
+            self.nodes -= 1
+            return self.Quiescence(alpha, beta, ply)
+
+        moves = self.chess.GetLegalMoves()
+
+        if len(moves) == 0:
+            # checkmate or stalemate
+            return -MATE_SCORE + ply if self.chess.board.attackers else 0
+
+        in_check = self.chess.board.attackers != 0
+
+        if self.use_null_move and allow_null and not pv_node and not in_check and depth >= NULL_MOVE_MIN_DEPTH \
+                and abs(beta) < MATE_BOUND and self.HasNonPawnMaterial():
+            # null-move pruning: if passing the turn still fails high, a real move almost certainly would too
+            reduction = NULL_MOVE_REDUCTION + (depth > NULL_MOVE_DEEP_DEPTH)
+
+            self.chess.MakeNullMove()
+            evaluation = -self.AlphaBeta(max(0, depth - 1 - reduction), -beta, -beta + 1, ply + 1, False)
+            self.chess.UnmakeNullMove()
+
+            if self.stop:
+                return 0
+
+            if evaluation >= beta:
+                if depth < NULL_MOVE_VERIFY_DEPTH:
+                    return beta
+
+                # verify with a reduced search that doesn't pass, so a zugzwang position isn't pruned
+                if self.AlphaBeta(depth - 1 - reduction, beta - 1, beta, ply, False) >= beta:
+                    return beta
+
+                if self.stop:
+                    return 0
+
+        original_alpha = alpha
+        best_score = -MATE_SCORE - 1
+        best_move = 0
+
+        for move_number, move in enumerate(self.ordering.OrderedMoves(self.chess.board, moves, tt_move, ply)):
+            reduction = 0
+
+            if self.use_lmr and move_number >= LMR_MIN_MOVES and depth >= LMR_MIN_DEPTH and not in_check \
+                    and not move & (CAPTURE | PROMOTION) and not self.chess.GivesCheck(move):
+                # late move reduction: quiet moves this far down the order rarely matter, search them shallower
+                reduction = min(self.lmr_table[depth][move_number], depth - 2)
+
             self.chess.MakeMove(move)
 
-            evaluation = -self.AlphaBeta(depth-1, -beta, -alpha)
+            if move_number == 0:
+                evaluation = -self.AlphaBeta(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # principal variation search: with good ordering the first move is best, so only prove the others are
+                # no better with a null window, and search again with the full window if one is
+                evaluation = -self.AlphaBeta(depth - 1 - reduction, -alpha - 1, -alpha, ply + 1)
+
+                if reduction and evaluation > alpha and not self.stop:
+                    # the reduced search says the move might be good, check at full depth
+                    evaluation = -self.AlphaBeta(depth - 1, -alpha - 1, -alpha, ply + 1)
+
+                if alpha < evaluation < beta and not self.stop:
+                    evaluation = -self.AlphaBeta(depth - 1, -beta, -alpha, ply + 1)
 
             self.chess.UnmakeMove()
 
-            if evaluation >= beta:
-                # snip
-                return beta
-            
-            alpha = max(evaluation, alpha)
+            if self.stop:
+                # out of time or nodes, the result of this node is incomplete so it isn't stored
+                return 0
 
-            if depth == self.search_depth:
-                self.move_scores[move] = alpha
+            if evaluation > best_score:
+                best_score = evaluation
+                best_move = move
+
+                if evaluation > alpha:
+                    alpha = evaluation
+
+                    # this node's line is the move followed by the child's line
+                    self.pv_table[ply][ply] = move
+                    self.pv_table[ply][ply + 1 : self.pv_length[ply + 1]] = self.pv_table[ply + 1][ply + 1 : self.pv_length[ply + 1]]
+                    self.pv_length[ply] = self.pv_length[ply + 1]
+
+                    if alpha >= beta:
+                        # snip
+                        self.ordering.Cutoff(self.chess.board, move, depth, ply, move_number)
+                        break
+
+        if best_score >= beta:
+            bound = LOWER
+        elif best_score <= original_alpha:
+            bound = UPPER
+        else:
+            bound = EXACT
+
+        self.tt.Store(key, depth, ScoreToTT(best_score, ply), bound, best_move)
+
+        if ply == 0:
+            self.best_move = best_move
 
-        return alpha
+        return best_score
 
     def RandomMove(self):
-        move = random.choice(self.chess.moveGen.possible_moves)
+        move = random.choice(self.chess.GetLegalMoves())
         
         return move
     
-    def BestMove(self):
-        self.move_scores = {}
-        self.AlphaBeta(self.search_depth, -math.inf, math.inf)
+    def Quiescence(self, alpha, beta, ply):
+        """
+        search captures and promotions until the position is quiet, so that leaves aren't evaluated in the middle of
+        an exchange. The side to move can stand pat, take the static evaluation instead of capturing, unless it's in
+        check, when every evasion is searched
+        """
+        if self.stop:
+            return 0
+
+        self.nodes += 1
+        self.qnodes += 1
+
+        if self.nodes % CHECK_INTERVAL == 0 or self.node_limit is not None:
+            self.CheckLimits()
+
+        if self.chess.InCheck():
+            moves = self.chess.GetLegalMoves()
+
+            if len(moves) == 0:
+                return -MATE_SCORE + ply
+
+            best_score = -MATE_SCORE - 1
+            stand_pat = None
+        else:
+            self.evaluate.board = self.chess.board
+            stand_pat = self.evaluate.Evaluate()
+
+            if stand_pat >= beta:
+                return stand_pat
+
+            alpha = max(alpha, stand_pat)
+            best_score = stand_pat
+            moves = self.chess.GetCaptures()
+
+        for move in self.ordering.OrderedMoves(self.chess.board, moves, 0, ply):
+            if stand_pat is not None and not move & PROMOTION:
+                # delta pruning, even winning the captured piece for free wouldn't get to alpha
+                victim = 'p' if move & 0xf000 == EP_CAPTURE else self.chess.board.GetPieceOnSquare(move & 63).name
+
+                if stand_pat + self.evaluate.PIECE_VALUES[victim] + DELTA_MARGIN <= alpha:
+                    continue
+
+                # a capture that loses material once the recaptures are played out isn't worth searching. A king is
+                # never recaptured, and taking a piece worth as much as the capturer can't lose
+                attacker = self.chess.board.GetPieceOnSquare((move >> 6) & 63).name
 
-        best_move = max(self.move_scores, key=self.move_scores.get)
+                if self.evaluate.PIECE_VALUES.get(attacker, 0) > self.evaluate.PIECE_VALUES[victim] \
+                        and self.chess.StaticExchange(move, self.evaluate.PIECE_VALUES) < 0:
+                    continue
+
+            self.chess.MakeMove(move)
+
+            evaluation = -self.Quiescence(-beta, -alpha, ply + 1)
+
+            self.chess.UnmakeMove()
+
+            if self.stop:
+                return 0
+
+            if evaluation > best_score:
+                best_score = evaluation
+
+                if evaluation > alpha:
+                    alpha = evaluation
+
+                    if alpha >= beta:
+                        break
+
+        return best_score
+
+    def AspirationSearch(self, depth, previous_score):
+        """
+        search the root with a narrow window around the last iteration's score, which cuts off more. A score outside
+        the window is only a bound, so search again with the window widened on that side
+        """
+        if depth < ASPIRATION_DEPTH or abs(previous_score) > MATE_BOUND:
+            return self.AlphaBeta(depth, -MATE_SCORE - 1, MATE_SCORE + 1)
+
+        delta = ASPIRATION_WINDOW
+        alpha, beta = previous_score - delta, previous_score + delta
+
+        while True:
+            score = self.AlphaBeta(depth, alpha, beta)
+
+            if self.stop:
+                return score
+
+            if score <= alpha:
+                alpha = max(score - delta, -MATE_SCORE - 1)
+            elif score >= beta:
+                beta = min(score + delta, MATE_SCORE + 1)
+            else:
+                return score
+
+            delta *= 2
+
+    def PVString(self, pv):
+        """
+        moves of a line as a string. Each move is made to read the next, then all are unmade
+        """
+        move_strings = []
+
+        for move in pv:
+            move_strings.append(self.chess.MoveToString(move))
+            self.chess.MakeMove(move)
+
+        for _ in pv:
+            self.chess.UnmakeMove()
+
+        return ' '.join(move_strings)
+
+    def CheckLimits(self):
+        # the first iteration always completes, so there's a move to play
+        if not self.iterations:
+            return
+
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            self.stop = True
+
+        elif self.hard_deadline is not None and self.nodes % CHECK_INTERVAL == 0 and time.time() >= self.hard_deadline:
+            self.stop = True
+
+    def Stop(self):
+        """
+        stop the search as soon as possible, BestMove returns the deepest completed result
+        """
+        self.stop = True
+
+    @staticmethod
+    def AllocateTime(time_left, increment=0, moves_to_go=None):
+        """
+        (soft, hard) limits in seconds for a move, from the time left on the clock. No new iteration is started after
+        the soft limit, the search is cut off at the hard limit
+        """
+        available = max(0, time_left - MOVE_OVERHEAD)
+
+        # without a move count, assume the game goes on for a while yet
+        soft = available / (moves_to_go or 30) + 0.75 * increment
+        hard = min(available / 2 + increment, 4 * soft)
+
+        return min(soft, available), min(hard, available)
+
+    def BestMove(self, max_depth=None, time_limit=None, node_limit=None, time_left=None, increment=0, moves_to_go=None):
+        """
+        iterative deepening: search depth 1, 2, 3... until a limit is hit, and play the best move of the deepest
+        completed iteration. Each iteration puts its best move in the transposition table, which is searched first in
+        the next one.
+
+        max_depth: deepest iteration, self.search_depth if no other limit is given
+        time_limit: seconds for this move
+        node_limit: nodes for this move
+        time_left, increment, moves_to_go: clock, the time for this move is worked out from them
+        """
+        if time_left is not None:
+            soft_limit, hard_limit = self.AllocateTime(time_left, increment, moves_to_go)
+        elif time_limit is not None:
+            # an iteration rarely takes less time than all the ones before it, so don't start one after half the time
+            soft_limit, hard_limit = time_limit / 2, time_limit
+        else:
+            soft_limit, hard_limit = None, None
+
+        if max_depth is None:
+            max_depth = self.search_depth if hard_limit is None and node_limit is None else MAX_DEPTH
+
+        self.start_time = time.time()
+        self.hard_deadline = None if hard_limit is None else self.start_time + hard_limit
+        self.node_limit = node_limit
+        self.nodes = 0
+        self.qnodes = 0
+        self.stop = False
+        self.iterations = []
+        # with no legal moves the root never sets it, don't leave the last search's move there
+        self.best_move = None
+
+        self.tt.NewSearch()
+        self.ordering.NewSearch()
+        best_move = None
+
+        score = 0
+
+        for depth in range(1, max_depth + 1):
+            score = self.AspirationSearch(depth, score)
+
+            if self.stop:
+                break
+
+            best_move = self.best_move
+            self.pv = self.pv_table[0][:self.pv_length[0]]
+            elapsed = time.time() - self.start_time
+            self.iterations.append((depth, score, self.nodes, elapsed, best_move))
+
+            if self.verbose:
+                print(f"depth {depth} | score {score} | nodes {self.nodes} | time {elapsed : .3f}s | pv {self.PVString(self.pv)} | qnodes {self.qnodes / max(1, self.nodes) : .1%} | first move cutoffs {self.ordering.FirstMoveCutoffRate() : .1%} | hashfull {self.tt.Hashfull() / 1000 : .1%}")
+
+            if abs(score) > MATE_BOUND or (soft_limit is not None and elapsed >= soft_limit):
+                # a mate found now won't get any shorter
+                break
+
+        self.best_move = best_move
 
         return best_move
      
@@ -126,7 +664,7 @@ if __name__ == '__main__':
     engine = Engine()
    
     while engine.run:
-        option = input("\n(T)est, (C)ompare with Stockfish, (Q)uit: ").strip().upper()
+        option = input("\n(T)est, (P)arallel test, (B)enchmark backends, (S)earch benchmark, (C)ompare with Stockfish, (Q)uit: ").strip().upper()
 
         if option == "T":
             fen = input("Fen: ").strip()
@@ -137,6 +675,8 @@ if __name__ == '__main__':
                 engine.chess = ChessLogic(fen)
 
             depth = int(input('Depth limit: '))    
+            cache_mb = input('Perft cache size in MB (blank for none): ').strip()
+            engine.perft_table = PerftTable(int(cache_mb)) if cache_mb else None
             print(f'Testing on: {engine.chess.board.position_fen}') 
 
             start = time.time()
@@ -147,6 +687,43 @@ if __name__ == '__main__':
             print(f"Time taken: {time_taken : .4f} seconds")
             print(f"Positions per second: {positions / time_taken : .4f}")
 
+            if engine.perft_table is not None:
+                print(f"Perft cache: {engine.perft_table.hits} hits | {engine.perft_table.misses} misses | hit rate {engine.perft_table.HitRate() : .2%}")
+
+        elif option == "P":
+            fen = input("Fen: ").strip()
+
+            if not fen:
+                fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+            depth = int(input('Depth limit: '))
+            workers = input('Workers (blank for one per core): ').strip()
+            split_depth = input('Split depth (blank for 1): ').strip()
+
+            start = time.time()
+            positions = engine.ParallelPerft(fen, depth, int(workers) if workers else None, int(split_depth) if split_depth else 1)
+            print(f'Depth: {depth} | Num of positions: {positions}')
+            time_taken = time.time() - start
+            print(f"Time taken: {time_taken : .4f} seconds")
+            print(f"Positions per second: {positions / time_taken : .4f}")
+
+        elif option == "B":
+            fen = input("Fen: ").strip()
+
+            if not fen:
+                fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+            depth = int(input('Depth limit: '))
+
+            results = engine.BenchmarkBackends(fen, depth)
+            print(f"int backend is {results['int'] / results['numpy'] : .2f}x the numpy backend")
+
+        elif option == "S":
+            fen = input("Fen (blank for benchmark positions): ").strip()
+            depth = int(input('Depth limit: '))
+
+            engine.BenchmarkSearch([fen] if fen else BENCH_FENS, depth)
+
         elif option == "C":
             engine.ComparePerft()
 
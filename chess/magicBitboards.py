@@ -0,0 +1,225 @@
+"""
+Magic bitboards for sliding pieces.
+
+For every square, the squares that can block a rook (or bishop) form a relevant occupancy mask. Multiplying the
+masked occupancy by a magic number and shifting right leaves a unique index into a table of precomputed attack sets,
+so a slider's attacks are found with a single mask-multiply-shift lookup instead of walking rays.
+
+Squares follow the rest of the board: square 0 is a8, square 63 is h1, and square n is bit 63-n of a bitboard.
+"""
+
+import random
+
+MASK_64 = (1 << 64) - 1
+
+# (rank step, file step) in square coordinates, rank 0 is the 8th rank
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, 1), (0, -1))
+BISHOP_DIRECTIONS = ((-1, 1), (-1, -1), (1, 1), (1, -1))
+
+"""
+magic numbers found by FindMagic, indexed by square. Regenerate with `python magicBitboards.py`
+"""
+ROOK_MAGICS = (
+    0x0080840900408022, 0x508001489a081004, 0x00020001c4081002, 0x0022010804102002,
+    0x0000050010002109, 0x0040200812408202, 0x0000204000110081, 0xd200468011210202,
+    0x0001000208904100, 0x0022000801040200, 0x002200c924100200, 0x2481080080240280,
+    0x4068080010008080, 0xc068102000490100, 0x47d0890040003300, 0x0000204096030600,
+    0x80601c8400420021, 0x0083000200010084, 0x0902000408020011, 0x1000080100050010,
+    0x0097041000090020, 0x048c200015010040, 0x0050102000404000, 0x2420204000808000,
+    0x8000140082000051, 0x0001011024000288, 0x1103000289000400, 0x0042040801001100,
+    0x0200801000800802, 0x0000802002801008, 0x6070004000402000, 0x2400400030800080,
+    0x08090003000144a2, 0x1500020400081001, 0x5040040080800200, 0x8a01000500480010,
+    0x8010001100210008, 0x0038100080200080, 0x1040004880200480, 0x0080400080082880,
+    0x0000020005005884, 0x000b240011081082, 0xc208808004000200, 0x0800808008000400,
+    0x0020828010004800, 0x4020030021410112, 0x2022060020488104, 0x44c0008000204088,
+    0x810500204100039a, 0x8002000108040200, 0x0000808002000400, 0x0010800800800400,
+    0x000d801800801002, 0x0460801000802000, 0x8800c00820015002, 0x0820800080204004,
+    0x23001020c1850002, 0x4080810002000080, 0x0200080410020001, 0x0980040008008002,
+    0x8200120004204008, 0x9080200010008008, 0x2240200010004000, 0x0c80004000356080,
+)
+
+BISHOP_MAGICS = (
+    0x8420110408204241, 0x43a9200404408405, 0x6000003010094840, 0x00008900c0082200,
+    0x20000002220a0200, 0x0440418204840420, 0x2108203088041008, 0x2800104804104862,
+    0x8404010244010318, 0x4020200101510600, 0x800445100a220001, 0x00000441c8220000,
+    0x1401444084040c41, 0xc081410041100200, 0x0010820101201000, 0x8083140324c02204,
+    0x2802440c42890200, 0x00210c04044a0080, 0x0188100400201810, 0x4004400491050200,
+    0x9000504010400e00, 0x6012420140410c00, 0x0009010190186012, 0xc008285804004800,
+    0x0280808080210400, 0x000d080120848420, 0x822008014a028201, 0x8002120200040084,
+    0x0004110800040041, 0x241404ec00880240, 0x2022100200048804, 0x0002022000c028a0,
+    0x005400422500420c, 0x0202040000512848, 0x0028002011100804, 0x0000840002802010,
+    0x8830040080440008, 0x00080800040534a0, 0x0402210008080080, 0x210820414004414e,
+    0x4008200041041000, 0x4014008904010450, 0x0009001080a02100, 0x0002000422010000,
+    0x0080800802044104, 0x0810400204040020, 0x20080c0401041c10, 0x0010814002480100,
+    0x2040c04402080200, 0x4020022202200404, 0x0401020803080800, 0x608002021081c004,
+    0x2100080845000008, 0x2101084801083000, 0x0000204812404040, 0x0900050810010200,
+    0x020100210c224000, 0x0401080802084010, 0x0000882008206000, 0x1048484000000002,
+    0x6208a09200102000, 0x4061310102082008, 0x0010048100420048, 0xa002100401004202,
+)
+
+
+def SquareToBB(square):
+    return 1 << (63 - square)
+
+
+def SlidingAttacks(square, occupancy, directions):
+    """
+    walk each ray from square until the edge of the board or the first blocker, blocker included
+    """
+    attacks = 0
+    rank, file = square // 8, square % 8
+
+    for d_rank, d_file in directions:
+        r, f = rank + d_rank, file + d_file
+
+        while 0 <= r <= 7 and 0 <= f <= 7:
+            bb = SquareToBB(8*r + f)
+            attacks |= bb
+
+            if occupancy & bb:
+                break
+
+            r, f = r + d_rank, f + d_file
+
+    return attacks
+
+
+def RelevantOccupancyMask(square, directions):
+    """
+    squares whose occupancy changes the attack set of a slider on square. Edge squares never block anything past
+    them, so they are left out to keep the tables small
+    """
+    mask = 0
+    rank, file = square // 8, square % 8
+
+    for d_rank, d_file in directions:
+        r, f = rank + d_rank, file + d_file
+
+        while 0 <= r + d_rank <= 7 and 0 <= f + d_file <= 7:
+            mask |= SquareToBB(8*r + f)
+            r, f = r + d_rank, f + d_file
+
+    return mask
+
+
+def Subsets(mask):
+    """
+    every subset of mask, enumerated with the carry-rippler trick
+    """
+    subset = 0
+
+    while True:
+        yield subset
+        subset = (subset - mask) & mask
+
+        if subset == 0:
+            break
+
+
+def BuildAttackTable(square, directions, magic):
+    mask = RelevantOccupancyMask(square, directions)
+    shift = 64 - bin(mask).count('1')
+
+    table = [0] * (1 << (64 - shift))
+
+    for occupancy in Subsets(mask):
+        table[((occupancy * magic) & MASK_64) >> shift] = SlidingAttacks(square, occupancy, directions)
+
+    return mask, shift, table
+
+
+def FindMagic(square, directions, rng=random):
+    """
+    search for a magic number that maps every relevant occupancy of square to an index without destructive collisions
+    """
+    mask = RelevantOccupancyMask(square, directions)
+    shift = 64 - bin(mask).count('1')
+
+    occupancies = list(Subsets(mask))
+    attacks = [SlidingAttacks(square, occ, directions) for occ in occupancies]
+
+    while True:
+        # sparse random numbers make better magic candidates
+        magic = rng.getrandbits(64) & rng.getrandbits(64) & rng.getrandbits(64)
+
+        if bin((mask * magic) & 0xFF00000000000000).count('1') < 6:
+            continue
+
+        used = {}
+
+        for occ, attack in zip(occupancies, attacks):
+            index = ((occ * magic) & MASK_64) >> shift
+
+            if used.setdefault(index, attack) != attack:
+                break
+        else:
+            return magic
+
+
+def PopulateSliderTables(directions, magics):
+    masks, shifts, tables = [], [], []
+
+    for sq in range(64):
+        mask, shift, table = BuildAttackTable(sq, directions, magics[sq])
+
+        masks.append(mask)
+        shifts.append(shift)
+        tables.append(table)
+
+    return masks, shifts, tables
+
+
+# built once on import
+ROOK_MASKS, ROOK_SHIFTS, ROOK_TABLE = PopulateSliderTables(ROOK_DIRECTIONS, ROOK_MAGICS)
+BISHOP_MASKS, BISHOP_SHIFTS, BISHOP_TABLE = PopulateSliderTables(BISHOP_DIRECTIONS, BISHOP_MAGICS)
+
+
+def RookAttacks(square, occupancy):
+    """
+    occupancy must be a python int
+    """
+    return ROOK_TABLE[square][(((occupancy & ROOK_MASKS[square]) * ROOK_MAGICS[square]) & MASK_64) >> ROOK_SHIFTS[square]]
+
+
+def BishopAttacks(square, occupancy):
+    """
+    occupancy must be a python int
+    """
+    return BISHOP_TABLE[square][(((occupancy & BISHOP_MASKS[square]) * BISHOP_MAGICS[square]) & MASK_64) >> BISHOP_SHIFTS[square]]
+
+
+def QueenAttacks(square, occupancy):
+    return RookAttacks(square, occupancy) | BishopAttacks(square, occupancy)
+
+
+def BuildLineTables():
+    """
+    for squares a and b that share a rank, file or diagonal, BETWEEN[a][b] is the squares strictly between them and
+    LINE[a][b] is the whole line through both, edge to edge. Both are 0 for squares that aren't aligned
+    """
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+
+    for a in range(64):
+        for directions in (ROOK_DIRECTIONS, BISHOP_DIRECTIONS):
+            for b in range(64):
+                if a != b and SlidingAttacks(a, 0, directions) & SquareToBB(b):
+                    between[a][b] = SlidingAttacks(a, SquareToBB(b), directions) & SlidingAttacks(b, SquareToBB(a), directions)
+                    line[a][b] = (SlidingAttacks(a, 0, directions) & SlidingAttacks(b, 0, directions)) | SquareToBB(a) | SquareToBB(b)
+
+    return between, line
+
+
+BETWEEN, LINE = BuildLineTables()
+
+
+if __name__ == '__main__':
+    rng = random.Random(2023)
+
+    for name, directions in [('ROOK_MAGICS', ROOK_DIRECTIONS), ('BISHOP_MAGICS', BISHOP_DIRECTIONS)]:
+        magics = [FindMagic(sq, directions, rng) for sq in range(64)]
+
+        print(f'{name} = (')
+        for i in range(0, 64, 4):
+            print('    ' + ' '.join(f'0x{m:016x},' for m in magics[i:i+4]))
+        print(')\n')
@@ -1,14 +1,4 @@
 
-class Move:
-    def __init__(self, piece, initial, dest, type, captured_piece=None):
-        self.piece = piece
-        self.initial = initial
-        self.dest = dest
-        self.type = type
-        self.captured_piece = captured_piece
-        self.is_promotion_move = False
-
-
 """
 Move representation
 
@@ -17,8 +7,61 @@ can use 16 bits to store a move:
 5:0 -> dest square
 11:6 -> initial square
 
-15:12 -> flags for move kind and promoted piece 
+15:12 -> flags for move kind and promoted piece
+
+move generation, make/unmake and search all work on these integers. Move objects are only built at the UI boundary,
+where the piece being moved and a readable move type are needed
+"""
+
+"""
+special move flags. most significant 4 bits in 16-bit word. 6 and 7 unused.
+"""
+QUIET = 0x0000
+DOUBLE_PAWN_PUSH = 0x1000
+KING_CASTLE = 0x2000
+QUEEN_CASTLE = 0x3000
+CAPTURE = 0x4000
+EP_CAPTURE = 0x5000
+KNIGHT_PROMO = 0x8000
+BISHOP_PROMO = 0x9000
+ROOK_PROMO = 0xa000
+QUEEN_PROMO = 0xb000
+
+# set in every promotion flag
+PROMOTION = 0x8000
 
+SPECIAL_MOVE_FLAGS = {"quiet": QUIET, "dpp": DOUBLE_PAWN_PUSH, "king_castle": KING_CASTLE, "queen_castle": QUEEN_CASTLE,
+                      "captures": CAPTURE, "ep_capture": EP_CAPTURE, "knight_promo": KNIGHT_PROMO, "bishop_promo": BISHOP_PROMO,
+                      "rook_promo": ROOK_PROMO, "queen_promo": QUEEN_PROMO, "kpc": KNIGHT_PROMO | CAPTURE, "bpc": BISHOP_PROMO | CAPTURE,
+                      "rpc": ROOK_PROMO | CAPTURE, "qpc": QUEEN_PROMO | CAPTURE}
 
+# order promotions are generated in. The UI relies on queen, knight, rook, bishop
+PROMOTION_FLAGS = (QUEEN_PROMO, KNIGHT_PROMO, ROOK_PROMO, BISHOP_PROMO)
 
-"""
\ No newline at end of file
+# promoted piece, indexed by the lowest 2 bits of a promotion flag
+PROMOTION_PIECES = ('N', 'B', 'R', 'Q')
+
+
+def EncodeMove(from_sq, to_sq, flag):
+    return flag | from_sq << 6 | to_sq
+
+def MoveFrom(move):
+    return (move >> 6) & 63
+
+def MoveTo(move):
+    return move & 63
+
+def MoveFlag(move):
+    return move & 0xf000
+
+def PromotionPiece(move):
+    return PROMOTION_PIECES[(move >> 12) & 3]
+
+
+class Move:
+    def __init__(self, piece, initial, dest, type, code=None):
+        self.piece = piece
+        self.initial = initial
+        self.dest = dest
+        self.type = type
+        self.code = code
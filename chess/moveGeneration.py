@@ -1,18 +1,38 @@
-import numpy as np
 from typing import Any
-from move import Move
+from array import array
+from move import SPECIAL_MOVE_FLAGS, QUIET, DOUBLE_PAWN_PUSH, KING_CASTLE, QUEEN_CASTLE, CAPTURE, EP_CAPTURE, PROMOTION, PROMOTION_FLAGS, EncodeMove, PromotionPiece
+from classicalBitboard import MASK_64, WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE
+from magicBitboards import BishopAttacks, RookAttacks, BETWEEN, LINE
+from bitOperations import IsSingleBit, LSBSquare, IterSquares, PopCount
 import time
 
-"""
-special move flags. most significant 4 bits in 16-bit word. 6 and 7 unused.
-"""
-SPECIAL_MOVE_FLAGS = {"quiet": 0x0000, "dpp":0x1000, "king_castle":0x2000, "queen_castle":0x3000, "captures":0x4000, "ep_capture":0x5000, 
-                      "knight_promo":0x8000, "bishop_promo":0x9000, "rook_promo":0xa000, "queen_promo":0xb000, "kpc":0xc000, "bpc":0xd000,
-                      "rpc":0xe000, "qpc":0xf000}
+# stands in for the king in exchanges, more than everything else on the board
+KING_VALUE = 20000
 
 class GenerateMoves:
     def __init__(self, board_object):
-        self.possible_moves = [] # stores moves for all pieces expect kings
+        self.possible_moves = array('H') # 16-bit encoded moves, see move.py
+        self.move_buffer = array('H') # moves being generated
+
+        # which kinds of move GenerateMoves emits
+        self.generate_captures = True
+        self.generate_quiets = True
+
+        # when counting, moves found set-wise are only counted, see CountLegalMoves
+        self.count_only = False
+        self.move_count = 0
+
+        # set when the position changes, SetUpMoveFilters recomputes the masks below
+        self.filters_stale = True
+
+        # pinned ally pieces, and the squares each of them is restricted to
+        self.pinned = 0
+        # pinned square -> squares it may move to. Its attacks stop at the king and the pinner, so the full line is as
+        # good as the squares between them
+        self.pin_rays = {}
+
+        # ally pieces that give discovered check by moving off their line
+        self.discoverers = None
 
         self.ally_king = None
         self.enemy_king = None
@@ -25,371 +45,164 @@ class GenerateMoves:
         """
         self.KING_TABLE : dict[int, Any] = {}
         self.KNIGHT_TABLE : dict[int, Any] = {}
-        self.RAYS : dict[str, dict[int, Any]] = {}
+        # squares a pawn of each colour attacks
+        self.PAWN_TABLE : dict[str, dict[int, int]] = {'w': {}, 'b': {}}
         for sq in range(0, 64):
             # each square key stores bitboard of attack set
             self.KING_TABLE[sq] = 0
             self.KNIGHT_TABLE[sq] = 0
+            self.PAWN_TABLE['w'][sq] = 0
+            self.PAWN_TABLE['b'][sq] = 0
 
         # legal move filtration
         self.capture_mask = 0 # bitboard of all squares we can possibly capture to
         self.push_mask = 0 # bitboard of all squares we can popssibly move to
         self.number_of_attackers = 0
 
-        self.opposite_dir = {'N': 'S', 'E': 'W', 'NE': 'SW', 'NW': 'SE', 'SE': 'NW', 'SW': 'NE', 'S': 'N', 'W':'E'}
-
-        self.CASTLING_MASKS = {'CQ': {'R': np.uint64(128), 'd': np.uint64(120)}, 'CK': {'R': np.uint64(1), 'd': np.uint64(14)}, 'Ck': {'r': np.uint64(2**56), 'd': np.uint64(2**59 + 2**58 + 2**57)}, 'Cq': {'r': np.uint64(2**63), 'd': np.uint64(2**62 + 2**61 + 2**59 + 2**60)}}
-        self.get_castling_masks = lambda type, *k: [self.CASTLING_MASKS[type][i] for i in k]
-
     def GetMoveCode(self, from_sq, to_sq, special_flag):
-        return SPECIAL_MOVE_FLAGS[special_flag] | np.uint16(from_sq) << 6 | np.uint16(to_sq)
-    
-    def PossibleWhitePawnMoves(self):
-        rank_8 = self.board.RANKS(8)
-        rank_4 = self.board.RANKS(4)
-        rank_5 = self.board.RANKS(5)
-
-        # right captures
-        r_captures = (self.board.white_pawns << np.uint64(7)) & ~rank_8 & ~self.board.A_FILE
-
-        if self.board.active_piece == 'b':
-            self.board.king_danger_squares |= r_captures
-
-        else:
-            dest_squares = self.board.BBToSquares(r_captures & self.board.all_blacks & self.capture_mask)
-
-            for sq in dest_squares:
-                white_pawn = self.board.GetPieceOnSquare(sq + 7)
-                self.possible_moves.append(Move(white_pawn, white_pawn.square, sq, '_'))
-
-        # left_captures
-        l_captures = (self.board.white_pawns << np.uint64(9)) & ~rank_8 & ~self.board.H_FILE
-
-        if self.board.active_piece == 'b':
-            self.board.king_danger_squares |= l_captures
-
-        else:
-            dest_squares = self.board.BBToSquares(l_captures & self.board.all_blacks & self.capture_mask)
-
-            for sq in dest_squares:
-                white_pawn = self.board.GetPieceOnSquare(sq + 9)
-                self.possible_moves.append(Move(white_pawn, white_pawn.square, sq, '_'))
-
-        # forward by 1
-        if self.board.active_piece == 'w':
-            forward_1 = (self.board.white_pawns << np.uint(8)) & self.board.empty & ~rank_8 & self.push_mask
-
-            dest_squares = self.board.BBToSquares(forward_1)
-
-            for sq in dest_squares:
-                white_pawn = self.board.GetPieceOnSquare(sq + 8)
-                self.possible_moves.append(Move(white_pawn, white_pawn.square, sq, '_'))
-
-        # forward by 2
-        if self.board.active_piece == 'w':
-            forward_2 = (self.board.white_pawns << np.uint64(16)) & self.board.empty & (self.board.empty << np.uint64(8)) & ~rank_8 & rank_4 & self.push_mask 
-            dest_squares = self.board.BBToSquares(forward_2)
-
-            for sq in dest_squares:
-                white_pawn = self.board.GetPieceOnSquare(sq + 16)
-                self.possible_moves.append(Move(white_pawn, white_pawn.square, sq, '_'))
-
-        # promotion by right captures
-        promo_r_captures = (self.board.white_pawns << np.uint64(7)) & rank_8 & ~self.board.A_FILE
-
-        if self.board.active_piece == 'b':
-            self.board.king_danger_squares |= promo_r_captures
-        else:
-            dest_squares = self.board.BBToSquares(promo_r_captures & self.board.all_blacks & self.capture_mask)
-
-            for sq in dest_squares:
-                for promotes_to in ['Q', 'N', 'R', 'B']:
-                    white_pawn = self.board.GetPieceOnSquare(sq + 7)
-                    self.possible_moves.append(Move(white_pawn, white_pawn.square, sq, promotes_to))
-
-        # promotion by left captures
-        promo_l_captures = (self.board.white_pawns << np.uint64(9)) & rank_8 & ~self.board.H_FILE 
-
-        if self.board.active_piece == 'b':
-            self.board.king_danger_squares |= promo_l_captures
-        else:
-            dest_squares = self.board.BBToSquares(promo_l_captures & self.board.all_blacks & self.capture_mask)
+        return EncodeMove(from_sq, to_sq, SPECIAL_MOVE_FLAGS[special_flag])
 
-            for sq in dest_squares:
-                for promotes_to in ['Q', 'N', 'R', 'B']:
-                    white_pawn = self.board.GetPieceOnSquare(sq + 9)
-                    self.possible_moves.append(Move(white_pawn, white_pawn.square, sq, promotes_to))
-
-        # promotion by forward 1
-        if self.board.active_piece == 'w':
-            promo_forward_1 = (self.board.white_pawns << np.uint(8)) & self.board.empty & rank_8 & self.push_mask
-
-            dest_squares = self.board.BBToSquares(promo_forward_1)
-
-            for sq in dest_squares:
-                for promotes_to in ['Q', 'N', 'R', 'B']:
-                    white_pawn = self.board.GetPieceOnSquare(sq + 8)
-                    self.possible_moves.append(Move(white_pawn, white_pawn.square, sq, promotes_to))
-
-        # en-passant
-        if len(self.board.move_history) >= 1:
-            last_move = self.board.move_history[-1]
-
-            piece, initial_square, final_sq = last_move.piece, last_move.initial, last_move.dest
-
-            if piece.name == 'p' and abs(initial_square-final_sq) == 2*8:
-                ep_file = final_sq%8 + 1
-                # move by black pawn 2 up
-
-                # en-passant right
-                if (self.board.white_pawns >> np.uint64(1)) & self.board.black_pawns & self.board.FILES[ep_file] & ~self.board.A_FILE & rank_5 != np.uint64(0):
-                    # if there's a black pawn next to white pawn that isn't on the A file as this is right captures
-                    # and is on the file on the en-passant pawn(last move)
-                    # both pawns must be on rank 5 (this implies black pawn must've moved 2 down)
-
-                    ep_right = (self.board.white_pawns << np.uint64(7))  & ~self.board.A_FILE & self.board.FILES[ep_file]
-
-                    if self.board.active_piece == 'b':
-                        self.board.king_danger_squares |= ep_right
-                    else:
-                        captured_piece = (self.board.white_pawns >> np.uint64(1)) & self.board.black_pawns & self.board.FILES[ep_file] & ~self.board.A_FILE & rank_5
-                        
-                        if ep_right & self.push_mask != 0 or captured_piece & self.capture_mask != 0:
-                            dest_squares = self.board.BBToSquares(ep_right)
-
-                            for sq in dest_squares:
-                                white_pawn = self.board.GetPieceOnSquare(sq + 7)
-                                self.possible_moves.append(Move(white_pawn, white_pawn.square, sq, 'EP'))
-
-                # en-passant left
-                if (self.board.white_pawns << np.uint64(1)) & self.board.black_pawns & self.board.FILES[ep_file] & ~self.board.H_FILE & rank_5 != np.uint64(0):
-                    # if there's a black pawn next to white pawn that isn't on the A file as this is right captures
-                    # and is on the file on the en-passant pawn(last move)
-                    # both pawns must be on rank 5 (this implies black pawn must've moved 2 down)
-
-                    ep_left = (self.board.white_pawns << np.uint64(9))  & ~self.board.H_FILE & self.board.FILES[ep_file]
-
-                    if self.board.active_piece == 'b':
-                        self.board.king_danger_squares |= ep_left
-                    else:
-                        captured_piece = (self.board.white_pawns << np.uint64(1)) & self.board.black_pawns & self.board.FILES[ep_file] & ~self.board.H_FILE & rank_5
-
-                        if ep_left & self.push_mask != 0 or captured_piece & self.capture_mask != 0:
-                            dest_squares = self.board.BBToSquares(ep_left)
-
-                            for sq in dest_squares:
-                                white_pawn = self.board.GetPieceOnSquare(sq + 9)
-                                self.possible_moves.append(Move(white_pawn, white_pawn.square, sq, 'EP'))
-                    
-    def PossibleBlackPawnMoves(self):
-        rank_1 = self.board.RANKS(1)
-        rank_5 = self.board.RANKS(5)
-        rank_4 = self.board.RANKS(4)
-
-        # right captures
-        r_captures = (self.board.black_pawns >> np.uint64(9)) & ~rank_1 & ~self.board.A_FILE
-
-        if self.board.active_piece == 'w':
-            self.board.king_danger_squares |= r_captures
-        else:
-            dest_squares = self.board.BBToSquares(r_captures & self.board.all_whites & self.capture_mask)
-
-            for sq in dest_squares:
-                black_pawn = self.board.GetPieceOnSquare(sq - 9)
-                self.possible_moves.append(Move(black_pawn, black_pawn.square, sq, '_'))
-
-        # left_captures
-        l_captures = (self.board.black_pawns >> np.uint64(7)) & ~rank_1 & ~self.board.H_FILE
+    def AddMoves(self, from_sq, targets):
+        """
+        encode a move from from_sq to every square in targets. targets must already exclude ally pieces, so any
+        occupied target is a capture
+        """
+        if self.count_only:
+            self.move_count += PopCount(int(targets))
+            return
 
-        if self.board.active_piece == 'w':
-            self.board.king_danger_squares |= l_captures
-        else:
-        
-            dest_squares = self.board.BBToSquares(l_captures & self.board.all_whites & self.capture_mask)
+        if self.generate_captures:
+            for dest_sq in IterSquares(int(targets & self.board.occupied)):
+                self.move_buffer.append(EncodeMove(from_sq, dest_sq, CAPTURE))
 
-            for sq in dest_squares:
-                black_pawn = self.board.GetPieceOnSquare(sq - 7)
-                self.possible_moves.append(Move(black_pawn, black_pawn.square, sq, '_'))
+        if self.generate_quiets:
+            for dest_sq in IterSquares(int(targets & self.board.empty)):
+                self.move_buffer.append(EncodeMove(from_sq, dest_sq, QUIET))
+    
+    def AddPawnMoves(self, targets, offset, flag):
+        """
+        encode a move onto every square in targets, from the square offset away. Pawns are shifted all at once, so the
+        shift tells us where each of them came from
+        """
+        if self.count_only:
+            self.move_count += PopCount(targets)
+            return
 
-        # forward by 1
-        if self.board.active_piece == 'b':
-            forward_1 = (self.board.black_pawns >> np.uint(8)) & self.board.empty & ~rank_1 & self.push_mask 
+        for sq in IterSquares(targets):
+            self.move_buffer.append(EncodeMove(sq + offset, sq, flag))
 
-            dest_squares = self.board.BBToSquares(forward_1)
+    def AddPawnPromotions(self, targets, offset, capture_flag):
+        if self.count_only:
+            self.move_count += len(PROMOTION_FLAGS) * PopCount(targets)
+            return
 
-            for sq in dest_squares:
-                black_pawn = self.board.GetPieceOnSquare(sq - 8)
-                self.possible_moves.append(Move(black_pawn, black_pawn.square, sq, '_'))
+        for sq in IterSquares(targets):
+            for promotion in PROMOTION_FLAGS:
+                self.move_buffer.append(EncodeMove(sq + offset, sq, promotion | capture_flag))
 
-        # forward by 2
-        if self.board.active_piece == 'b':
-            forward_2 = (self.board.black_pawns >> np.uint64(16)) & self.board.empty & (
-                        self.board.empty >> np.uint64(8)) & ~rank_1 & rank_5 & self.push_mask 
+    def PossibleWhitePawnMoves(self, pawns, allowed):
+        """
+        moves of the white pawns in bitboard pawns onto squares in allowed, en-passant aside
+        """
+        rank_8 = int(self.board.RANKS(8))
 
-            dest_squares = self.board.BBToSquares(forward_2)
+        if self.generate_captures:
+            enemies = int(self.board.all_blacks) & int(self.capture_mask) & allowed
 
-            for sq in dest_squares:
-                black_pawn = self.board.GetPieceOnSquare(sq - 16)
-                self.possible_moves.append(Move(black_pawn, black_pawn.square, sq, '_'))
+            # right and left captures
+            r_captures = (pawns << 7) & ~int(self.board.A_FILE) & enemies
+            l_captures = (pawns << 9) & ~int(self.board.H_FILE) & enemies
 
-        # promotion by right captures
-        promo_r_captures = (self.board.black_pawns >> np.uint64(9)) & rank_1 & ~self.board.A_FILE
+            self.AddPawnMoves(r_captures & ~rank_8, 7, CAPTURE)
+            self.AddPawnMoves(l_captures & ~rank_8, 9, CAPTURE)
+            self.AddPawnPromotions(r_captures & rank_8, 7, CAPTURE)
+            self.AddPawnPromotions(l_captures & rank_8, 9, CAPTURE)
 
-        if self.board.active_piece == 'w':
-            self.board.king_danger_squares |= promo_r_captures
-        else:
+        empty = int(self.board.empty)
+        pushes = int(self.push_mask) & allowed
 
-            dest_squares = self.board.BBToSquares(promo_r_captures & self.board.all_whites & self.capture_mask)
+        forward_1 = (pawns << 8) & empty
 
-            for sq in dest_squares:
-                for promotes_to in ['q', 'n', 'r', 'b']:
-                    black_pawn = self.board.GetPieceOnSquare(sq - 9)
-                    self.possible_moves.append(Move(black_pawn, black_pawn.square, sq, promotes_to))
+        if self.generate_captures:
+            # promotion by forward 1
+            self.AddPawnPromotions(forward_1 & rank_8 & pushes, 8, 0)
 
-        # promotion by left captures
-        promo_l_captures = (self.board.black_pawns >> np.uint64(7)) & rank_1 & ~self.board.H_FILE
+        if self.generate_quiets:
+            # the square in between only has to be empty, it may be outside the push mask
+            forward_2 = (forward_1 << 8) & empty & int(self.board.RANKS(4)) & pushes
 
-        if self.board.active_piece == 'w':
-            self.board.king_danger_squares |= promo_l_captures
-        else:
+            self.AddPawnMoves(forward_1 & ~rank_8 & pushes, 8, QUIET)
+            self.AddPawnMoves(forward_2, 16, DOUBLE_PAWN_PUSH)
 
-            dest_squares = self.board.BBToSquares(promo_l_captures & self.board.all_whites & self.capture_mask)
-
-            for sq in dest_squares:
-                for promotes_to in ['q', 'n', 'r', 'b']:
-                    black_pawn = self.board.GetPieceOnSquare(sq - 7)
-                    self.possible_moves.append(Move(black_pawn, black_pawn.square, sq, promotes_to))
-
-        # promotion by forward 1
-        if self.board.active_piece == 'b':
-            promo_forward_1 = (self.board.black_pawns >> np.uint(8)) & self.board.empty & rank_1 & self.push_mask 
-
-            dest_squares = self.board.BBToSquares(promo_forward_1)
-
-            for sq in dest_squares:
-                for promotes_to in ['q', 'n', 'r', 'b']:
-                    black_pawn = self.board.GetPieceOnSquare(sq - 8)
-                    self.possible_moves.append(Move(black_pawn, black_pawn.square, sq, promotes_to))
-
-        # en-passant
-        if len(self.board.move_history) >= 1:
-            last_move = self.board.move_history[-1]
-
-            piece, initial_square, final_sq = last_move.piece, last_move.initial, last_move.dest
-
-            if piece.name == 'P' and abs(initial_square - final_sq) == 2 * 8:
-                ep_file = final_sq % 8 + 1
-                # move by white pawn 2 up
-
-                # en-passant right
-                if (self.board.black_pawns >> np.uint64(1)) & self.board.white_pawns & self.board.FILES[
-                    ep_file] & ~self.board.A_FILE & rank_4 != np.uint64(0):
-                    # if there's a black pawn next to white pawn that isn't on the A file as this is right captures
-                    # and is on the file on the en-passant pawn(last move)
-                    # both pawns must be on rank 5 (this implies black pawn must've moved 2 down)
-
-                    ep_right = (self.board.black_pawns >> np.uint64(9)) & ~self.board.A_FILE & self.board.FILES[ep_file]
-
-                    if self.board.active_piece == 'w':
-                        self.board.king_danger_squares |= ep_right
-                    else:
-                        captured_piece = (self.board.black_pawns >> np.uint64(1)) & self.board.white_pawns & self.board.FILES[
-                    ep_file] & ~self.board.A_FILE & rank_4
-                        
-                        if ep_right & self.push_mask != 0 or captured_piece & self.capture_mask != 0:
-                            dest_squares = self.board.BBToSquares(ep_right)
-
-                            for sq in dest_squares:
-                                black_pawn = self.board.GetPieceOnSquare(sq - 9)
-                                self.possible_moves.append(Move(black_pawn, black_pawn.square, sq, 'EP'))
-
-                # en-passant left
-                if (self.board.black_pawns << np.uint64(1)) & self.board.white_pawns & self.board.FILES[
-                    ep_file] & ~self.board.H_FILE & rank_4 != np.uint64(0):
-                    # if there's a black pawn next to white pawn that isn't on the A file as this is right captures
-                    # and is on the file on the en-passant pawn(last move)
-                    # both pawns must be on rank 5 (this implies black pawn must've moved 2 down)
-
-                    ep_left = (self.board.black_pawns >> np.uint64(7)) & ~self.board.H_FILE & self.board.FILES[ep_file]
-
-                    if self.board.active_piece == 'w':
-                        self.board.king_danger_squares |= ep_left
-                    else:
-                        captured_piece = (self.board.black_pawns << np.uint64(1)) & self.board.white_pawns & self.board.FILES[
-                    ep_file] & ~self.board.H_FILE & rank_4
-
-                        if ep_left & self.push_mask != 0 or captured_piece & self.capture_mask != 0:
-                            dest_squares = self.board.BBToSquares(ep_left)
-
-                            for sq in dest_squares:
-                                black_pawn = self.board.GetPieceOnSquare(sq - 7)
-                                self.possible_moves.append(Move(black_pawn, black_pawn.square, sq, 'EP'))
-        
-    def PossibleWhitePawnKingAttacks(self, square):
+    def PossibleBlackPawnMoves(self, pawns, allowed):
         """
-        get possible attacks for a white pawn at a given square
-
-        this function checks specifically for possible captures moves of a given pawn
+        moves of the black pawns in bitboard pawns onto squares in allowed, en-passant aside
         """
-        pawn_bitboard = self.board.SquareToBB(square)
-        result = np.uint64(0)
+        rank_1 = int(self.board.RANKS(1))
 
-        rank_8 = self.board.RANKS(8)
-  
-        # right captures
-        r_captures = ((self.board.white_pawns & pawn_bitboard) << np.uint64(7)) & ~rank_8 & ~self.board.A_FILE
+        if self.generate_captures:
+            enemies = int(self.board.all_whites) & int(self.capture_mask) & allowed
 
-        result |= (r_captures & self.board.black_king)
+            # right and left captures
+            r_captures = (pawns >> 9) & ~int(self.board.A_FILE) & enemies
+            l_captures = (pawns >> 7) & ~int(self.board.H_FILE) & enemies
 
-        # left_captures
-        l_captures = ((self.board.white_pawns & pawn_bitboard) << np.uint64(9)) & ~rank_8 & ~self.board.H_FILE
+            self.AddPawnMoves(r_captures & ~rank_1, -9, CAPTURE)
+            self.AddPawnMoves(l_captures & ~rank_1, -7, CAPTURE)
+            self.AddPawnPromotions(r_captures & rank_1, -9, CAPTURE)
+            self.AddPawnPromotions(l_captures & rank_1, -7, CAPTURE)
 
-        result |= (l_captures & self.board.black_king)
+        empty = int(self.board.empty)
+        pushes = int(self.push_mask) & allowed
 
-        # promotion by right captures
-        promo_r_captures = ((self.board.white_pawns & pawn_bitboard) << np.uint64(7)) & rank_8 & ~self.board.A_FILE
+        forward_1 = (pawns >> 8) & empty
 
-        result |= (promo_r_captures & self.board.black_king)
+        if self.generate_captures:
+            # promotion by forward 1
+            self.AddPawnPromotions(forward_1 & rank_1 & pushes, -8, 0)
 
-        # promotion by left captures
-        promo_l_captures = ((self.board.white_pawns & pawn_bitboard) << np.uint64(9)) & rank_8 & ~self.board.H_FILE
+        if self.generate_quiets:
+            # the square in between only has to be empty, it may be outside the push mask
+            forward_2 = (forward_1 >> 8) & empty & int(self.board.RANKS(5)) & pushes
 
-        result |= (promo_l_captures & self.board.black_king)
-    
-        return result
+            self.AddPawnMoves(forward_1 & ~rank_1 & pushes, -8, QUIET)
+            self.AddPawnMoves(forward_2, -16, DOUBLE_PAWN_PUSH)
 
-    def PossibleBlackPawnKingAttacks(self, square):
+    def AddPawnMovesSetwise(self):
         """
-        get possible attacks for a white pawn at a given square
-
-        this function checks specifically for possible captures moves of a given pawn
+        pawn moves of the side to move. Unpinned pawns are moved together. Pinned pawns are rare and go one at a time,
+        each restricted to the line it's pinned on, so no move has to be filtered afterwards
         """
-        pawn_bitboard = self.board.SquareToBB(square)
-        result = np.uint64(0)
-
-        rank_1 = self.board.RANKS(1)
-    
-        # right captures
-        r_captures = ((self.board.black_pawns & pawn_bitboard) >> np.uint64(9)) & ~rank_1 & ~self.board.A_FILE
-
-        result |= (r_captures & self.board.white_king)
-
-        # left_captures
-        l_captures = ((self.board.black_pawns & pawn_bitboard) >> np.uint64(7)) & ~rank_1 & ~self.board.H_FILE
+        if self.board.active_piece == 'w':
+            pawns, pawn_moves = int(self.board.white_pawns), self.PossibleWhitePawnMoves
+        else:
+            pawns, pawn_moves = int(self.board.black_pawns), self.PossibleBlackPawnMoves
 
-        result |= (l_captures & self.board.white_king)
+        pawn_moves(pawns & ~self.pinned, MASK_64)
 
-        # promotion by right captures
-        promo_r_captures = ((self.board.black_pawns & pawn_bitboard) >> np.uint64(9)) & rank_1 & ~self.board.A_FILE
+        for sq in IterSquares(pawns & self.pinned):
+            pawn_moves(1 << (63 - sq), self.pin_rays[sq])
 
-        result |= (promo_r_captures & self.board.white_king)
+        if self.generate_captures and self.board.ep_square is not None:
+            self.AddEnPassant(pawns)
 
-        # promotion by left captures
-        promo_l_captures = ((self.board.black_pawns & pawn_bitboard) >> np.uint64(7)) & rank_1 & ~self.board.H_FILE
+    def AddEnPassant(self, pawns):
+        """
+        ally pawns that can capture onto the en-passant square stand where an enemy pawn on it would attack. Only
+        pawns next to the double pushed pawn qualify, which the attack table guarantees
+        """
+        ep_square = self.board.ep_square
+        white = self.board.active_piece == 'w'
 
-        result |= (promo_l_captures & self.board.white_king)
+        capturers = self.PAWN_TABLE['b' if white else 'w'][ep_square] & pawns
+        captured = 1 << (63 - (ep_square + 8 if white else ep_square - 8))
 
-        return result
+        # in check, en-passant either blocks the check or takes the checking pawn
+        if capturers and ((1 << (63 - ep_square)) & int(self.push_mask) or captured & int(self.capture_mask)):
+            for sq in IterSquares(capturers):
+                # IsLegalEP covers pinned pawns as well as the rank the two pawns leave
+                if self.IsLegalEP(sq, ep_square):
+                    self.move_buffer.append(EncodeMove(sq, ep_square, EP_CAPTURE))
 
     def GetKnightAttackSet(self, bitboard):
         rank_8 = self.board.RANKS(8)
@@ -399,37 +212,37 @@ class GenerateMoves:
         rank_78 = rank_7 | rank_8
         rank_12 = rank_1 | rank_2
 
-        knight_attack_set = np.uint64(0)
+        knight_attack_set = self.board.U64(0)
         
-        nne = (bitboard & ~(self.board.H_FILE | rank_78)) << np.uint64(15)
+        nne = (bitboard & ~(self.board.H_FILE | rank_78)) << 15
 
         knight_attack_set |= nne
 
-        ne = (bitboard & ~(self.board.GH_FILE | rank_8)) << np.uint64(6)
+        ne = (bitboard & ~(self.board.GH_FILE | rank_8)) << 6
         
         knight_attack_set |= ne
 
-        nnw = (bitboard & ~(self.board.A_FILE | rank_78)) << np.uint64(17)
+        nnw = (bitboard & ~(self.board.A_FILE | rank_78)) << 17
 
         knight_attack_set |= nnw
 
-        nw = (bitboard & ~(self.board.AB_FILE | rank_8)) << np.uint64(10)
+        nw = (bitboard & ~(self.board.AB_FILE | rank_8)) << 10
 
         knight_attack_set |= nw
 
-        sse = (bitboard & ~(self.board.H_FILE | rank_12)) >> np.uint64(17)
+        sse = (bitboard & ~(self.board.H_FILE | rank_12)) >> 17
 
         knight_attack_set |= sse
 
-        se = (bitboard & ~(self.board.GH_FILE | rank_1)) >> np.uint64(10)
+        se = (bitboard & ~(self.board.GH_FILE | rank_1)) >> 10
 
         knight_attack_set |= se
         
-        ssw = (bitboard & ~(self.board.A_FILE | rank_12)) >> np.uint64(15)
+        ssw = (bitboard & ~(self.board.A_FILE | rank_12)) >> 15
 
         knight_attack_set |= ssw
 
-        sw = (bitboard & ~(self.board.AB_FILE | rank_1)) >> np.uint64(6)
+        sw = (bitboard & ~(self.board.AB_FILE | rank_1)) >> 6
 
         knight_attack_set |= sw
 
@@ -439,34 +252,45 @@ class GenerateMoves:
         rank_8 = self.board.RANKS(8)
         rank_1 = self.board.RANKS(1)
     
-        king_attack_set = np.uint64(0)
+        king_attack_set = self.board.U64(0)
 
-        n = (bitboard & ~rank_8) << np.uint64(8)
+        n = (bitboard & ~rank_8) << 8
         king_attack_set |= n
 
-        e = (bitboard & ~self.board.H_FILE) >> np.uint64(1)
+        e = (bitboard & ~self.board.H_FILE) >> 1
         king_attack_set |= e
 
-        w = (bitboard & ~self.board.A_FILE) << np.uint64(1)
+        w = (bitboard & ~self.board.A_FILE) << 1
         king_attack_set |= w
 
-        s = (bitboard & ~rank_1) >> np.uint(8)
+        s = (bitboard & ~rank_1) >> 8
         king_attack_set |= s
 
-        ne = (bitboard & ~(rank_8 | self.board.H_FILE)) << np.uint64(7)
+        ne = (bitboard & ~(rank_8 | self.board.H_FILE)) << 7
         king_attack_set |= ne
 
-        nw = (bitboard & ~(rank_8 | self.board.A_FILE)) << np.uint64(9)
+        nw = (bitboard & ~(rank_8 | self.board.A_FILE)) << 9
         king_attack_set |= nw
 
-        se = (bitboard & ~(rank_1 | self.board.H_FILE)) >> np.uint64(9)
+        se = (bitboard & ~(rank_1 | self.board.H_FILE)) >> 9
         king_attack_set |= se
 
-        sw = (bitboard & ~(rank_1 | self.board.A_FILE)) >> np.uint64(7)
+        sw = (bitboard & ~(rank_1 | self.board.A_FILE)) >> 7
         king_attack_set |= sw
 
         return king_attack_set
 
+    def GetPawnAttackSet(self, bitboard, colour):
+        """
+        python int, unlike the other attack sets, as pawn generation works on python ints
+        """
+        bitboard = int(bitboard)
+
+        if colour == 'w':
+            return ((bitboard << 7) & ~int(self.board.A_FILE) | (bitboard << 9) & ~int(self.board.H_FILE)) & MASK_64
+        
+        return (bitboard >> 9) & ~int(self.board.A_FILE) | (bitboard >> 7) & ~int(self.board.H_FILE)
+
     def PopulateAttackTables(self):
         for sq, _ in self.KNIGHT_TABLE.items():
             initial_bitboard = self.board.SquareToBB(sq)
@@ -477,530 +301,113 @@ class GenerateMoves:
             initial_bitboard = self.board.SquareToBB(sq)
 
             self.KING_TABLE[sq] = self.GetKingAttackSet(initial_bitboard)
-    
-    @staticmethod
-    def GreaterThanDiagonal(square, dir):
-        x, y  = square % 8, square // 8
-
-        if dir == 'NE' or dir == 'SW':
-            return (x + y) >= 7
-
-        elif dir == 'NW' or dir == 'SE':
-            return (x - y) >= 0 
-
-    def GetNumberOfShifts(self, square, dir):
-        x, y  = square % 8, square // 8
-
-        if dir == 'NE':
-            if self.GreaterThanDiagonal(square, 'NE'):
-                return 7 - x
-            else:
-                return y
-
-        elif dir == 'SW':
-            if self.GreaterThanDiagonal(square, 'SW'):
-                return 7 - y
-            else:
-                return x
-
-        elif dir == 'NW':
-            if self.GreaterThanDiagonal(square, 'NW'):
-                return y
-            else:
-                return x
 
-        elif dir == 'SE':
-            if self.GreaterThanDiagonal(square, 'SE'):
-                return 7 - x
-            else:
-                return 7 - y
-
-        elif dir == 'N':
-            return  y
-
-        elif dir == 'E':
-            return 7 - x
-
-        elif dir == 'W':
-            return x
-
-        elif dir == 'S':
-            return 7 - y
-
-    def PopulateRayTable(self):
-        shift_by = {'N':8, 'E':1, 'W':1, 'S':8, 'NE':7, 'NW':9, 'SE':9, 'SW':7}
-        #restrictions = {'N':self.board.RANKS(8), 'E':self.board.H_FILE, 'W':self.board.A_FILE, 'S':self.board.RANKS(1), 'NE':self.board.RANKS(8), 'NW':self.board.RANKS(8), 'SE':self.board.RANKS(1), 'SW':self.board.RANKS(1)}
-
-        for dir in ['N','E','W','S','NE','NW','SE','SW']:
-            self.RAYS[dir] = {}
-
-            for sq in range(64):
-                ray = np.uint64(0)
-                sq_bitboard = self.board.SquareToBB(sq)
-
-                for shift in range(self.GetNumberOfShifts(sq, dir)):
-                    if dir in ['NE', 'NW', 'W', 'N']:
-                        # left shift
-                        ray |= sq_bitboard << np.uint64((shift + 1) * shift_by[dir])
-
-                    else:
-                        # right shift
-                        ray |= sq_bitboard >> np.uint64((shift + 1) * shift_by[dir])
+        for sq in range(64):
+            initial_bitboard = self.board.SquareToBB(sq)
 
-                self.RAYS[dir][sq] = ray
+            self.PAWN_TABLE['w'][sq] = self.GetPawnAttackSet(initial_bitboard, 'w')
+            self.PAWN_TABLE['b'][sq] = self.GetPawnAttackSet(initial_bitboard, 'b')
     
+    def PossibleBishopMoves(self, square):
+        return BishopAttacks(square, int(self.board.occupied))
 
-    def PossibleBishopMoves(self, piece_type, square):
-        # blockers is all other pieces except itself
-        blockers = self.board.occupied & ~self.board.SquareToBB(square)
-
-        #setup result
-        result = np.uint64(0)
-
-        # NE
-        ray = self.RAYS['NE'][square]
-        masked_blockers = ray & blockers
-
-        if masked_blockers == 0:
-            result |= ray
-
-            if (piece_type == 'B' and self.board.active_piece == 'b') or (piece_type == 'b' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-
-        elif ((piece_type == 'B' and self.board.active_piece == 'b' and masked_blockers & ~self.board.black_king == 0) or (piece_type == 'b' and self.board.active_piece == 'w' and masked_blockers & ~self.board.white_king == 0)):
-            self.board.king_danger_squares |= ray
-                
-        else:
-            n = self.board.BitscanForward(masked_blockers)
-
-            r = ray & ~self.RAYS['NE'][self.board.BBToSquares(n)[0]]
-
-            result |= r
-
-            if piece_type == 'B' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = self.board.BitscanForward(msbs_without_king)
-                r_prime = ray & ~self.RAYS['NE'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-                
-            elif piece_type == 'b' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = self.board.BitscanForward(msbs_without_king)
-                r_prime = ray & ~self.RAYS['NE'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-
-        # NW        
-        ray = self.RAYS['NW'][square]
-        masked_blockers = ray & blockers
-
-        if masked_blockers == 0:
-            result |= ray
-            
-            if (piece_type == 'B' and self.board.active_piece == 'b') or (piece_type == 'b' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-
-        elif ((piece_type == 'B' and self.board.active_piece == 'b' and masked_blockers & ~self.board.black_king == 0) or (piece_type == 'b' and self.board.active_piece == 'w' and masked_blockers & ~self.board.white_king == 0)):
-            self.board.king_danger_squares |= ray
-
-        else:
-            n = self.board.BitscanForward(masked_blockers)
-
-            r = ray & ~self.RAYS['NW'][self.board.BBToSquares(n)[0]]
-
-            result |= r 
-
-            if piece_type == 'B' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = self.board.BitscanForward(msbs_without_king)
-                r_prime = ray & ~self.RAYS['NW'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-                
-            elif piece_type  == 'b' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = self.board.BitscanForward(msbs_without_king)
-                r_prime = ray & ~self.RAYS['NW'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-
-        #SE
-        ray = self.RAYS['SE'][square]
-        masked_blockers = ray & blockers
-
-        if masked_blockers == 0:
-            result |= ray
-            
-            if (piece_type == 'B' and self.board.active_piece == 'b') or (piece_type == 'b' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-
-        elif ((piece_type == 'B' and self.board.active_piece == 'b' and masked_blockers & ~self.board.black_king == 0) or (piece_type == 'b' and self.board.active_piece == 'w' and masked_blockers & ~self.board.white_king == 0)):
-            self.board.king_danger_squares |= ray
-
-        else:
-            n = self.board.BitscanReverse(masked_blockers)
-
-            r = ray & ~self.RAYS['SE'][self.board.BBToSquares(n)[0]]
-
-            result |= r
-
-            if piece_type == 'B' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = self.board.BitscanReverse(msbs_without_king)
-                r_prime = ray & ~self.RAYS['SE'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares|= r_prime
-                
-            elif piece_type == 'b' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = self.board.BitscanReverse(msbs_without_king)
-                r_prime = ray & ~self.RAYS['SE'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-
-        #SW
-        ray = self.RAYS['SW'][square]
-        masked_blockers = ray & blockers
-
-        if masked_blockers == 0:
-            result |= ray
-            
-            if (piece_type == 'B' and self.board.active_piece == 'b') or (piece_type == 'b' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-
-        elif ((piece_type == 'B' and self.board.active_piece == 'b' and masked_blockers & ~self.board.black_king == 0) or (piece_type == 'b' and self.board.active_piece == 'w' and masked_blockers & ~self.board.white_king == 0)):
-            self.board.king_danger_squares |= ray
-
-
-        else:
-            n = self.board.BitscanReverse(masked_blockers)
-
-            r = ray & ~self.RAYS['SW'][self.board.BBToSquares(n)[0]]
+    def PossibleRookMoves(self, square):
+        return RookAttacks(square, int(self.board.occupied))
 
-            result |= r 
-
-            if piece_type == 'B' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = self.board.BitscanReverse(msbs_without_king)
-                r_prime = ray & ~self.RAYS['SW'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-                
-            elif piece_type == 'b' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = self.board.BitscanReverse(msbs_without_king)
-                r_prime = ray & ~self.RAYS['SW'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-
-        return result
-        
-
-    def PossibleRookMoves(self, piece_type, square):
-        # blockers is all other pieces except itself
-        blockers = self.board.occupied & ~self.board.SquareToBB(square)
-
-        #setup result
-        result = np.uint64(0)
-
-        # N
-        ray = self.RAYS['N'][square]
-        masked_blockers = ray & blockers
-
-        if masked_blockers == 0:
-            result |= ray
-            if (piece_type == 'R' and self.board.active_piece == 'b') or (piece_type == 'r' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-
-        elif ((piece_type == 'R' and self.board.active_piece == 'b' and masked_blockers & ~self.board.black_king == 0) or (piece_type == 'r' and self.board.active_piece == 'w' and masked_blockers & ~self.board.white_king == 0)):
-            self.board.king_danger_squares |= ray
-            
-        else:
-            n = self.board.BitscanForward(masked_blockers)
-
-            r = ray & ~self.RAYS['N'][self.board.BBToSquares(n)[0]]
-
-            result |= r 
-
-            if piece_type == 'R' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = self.board.BitscanForward(msbs_without_king)
-                r_prime = ray & ~self.RAYS['N'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-   
-            elif piece_type == 'r' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = self.board.BitscanForward(msbs_without_king)
-                r_prime = ray & ~self.RAYS['N'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-
-        # E        
-        ray = self.RAYS['E'][square]
-        masked_blockers = ray & blockers
-
-        if masked_blockers == 0:
-            result |= ray
-            
-            if (piece_type == 'R' and self.board.active_piece == 'b') or (piece_type == 'r' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-
-        elif ((piece_type == 'R' and self.board.active_piece == 'b' and masked_blockers & ~self.board.black_king == 0) or (piece_type == 'r' and self.board.active_piece == 'w' and masked_blockers & ~self.board.white_king == 0)):
-            self.board.king_danger_squares |= ray
-            
+    def GetPossibleMoves(self, piece):
+        """
+        For a given ally piece, the function appends to the move buffer all moves for the piece at its square. King
+        moves are only stored here, FilterKingMoves removes those onto attacked squares
+        """ 
+        if piece.colour == 'w':
+            targets = self.board.all_blacks | self.board.empty
         else:
-            n = self.board.BitscanReverse(masked_blockers)
-
-            r = ray & ~self.RAYS['E'][self.board.BBToSquares(n)[0]]
-            
-            result |= r 
-
-            if piece_type == 'R' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = self.board.BitscanReverse(msbs_without_king)
-                r_prime = ray & ~self.RAYS['E'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-                
-            elif piece_type == 'r' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = self.board.BitscanReverse(msbs_without_king)
-                r_prime = ray & ~self.RAYS['E'][self.board.BBToSquares(n_prime)[0]]
+            targets = self.board.all_whites | self.board.empty
 
-                self.board.king_danger_squares |= r_prime
+        if piece.name == 'K' or piece.name == 'k':
+            self.king_pseudo_legal_bitboard = self.KING_TABLE[piece.square] & targets
+            return
 
-        #W
-        ray = self.RAYS['W'][square]
-        masked_blockers = ray & blockers
+        if self.number_of_attackers > 1:
+            # double check, only the king can move
+            return
 
-        if masked_blockers == 0:
-            result |= ray
+        if piece.name == 'N' or piece.name == 'n':
+            attack_set = self.KNIGHT_TABLE[piece.square]
 
-            if (piece_type == 'R' and self.board.active_piece == 'b') or (piece_type == 'r' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
+        elif piece.name == 'B' or piece.name == 'b':
+            attack_set = self.PossibleBishopMoves(piece.square)
 
-        elif ((piece_type == 'R' and self.board.active_piece == 'b' and masked_blockers & ~self.board.black_king == 0) or (piece_type == 'r' and self.board.active_piece == 'w' and masked_blockers & ~self.board.white_king == 0)):
-            self.board.king_danger_squares |= ray
+        elif piece.name == 'R' or piece.name == 'r':
+            attack_set = self.PossibleRookMoves(piece.square)
 
         else:
-            n = self.board.BitscanForward(masked_blockers)
-
-            r = ray & ~self.RAYS['W'][self.board.BBToSquares(n)[0]]
-
-            result |= r
-
-            if piece_type == 'R' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                
-                n_prime = self.board.BitscanForward(msbs_without_king)
-                r_prime = ray & ~self.RAYS['W'][self.board.BBToSquares(n_prime)[0]]
+            attack_set = self.PossibleBishopMoves(piece.square) | self.PossibleRookMoves(piece.square)
 
-                self.board.king_danger_squares |= r_prime
-                
-            elif piece_type == 'r' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = self.board.BitscanForward(msbs_without_king)
-                r_prime = ray & ~self.RAYS['W'][self.board.BBToSquares(n_prime)[0]]
+        # filter ally moves
+        attack_set &= targets
 
-                self.board.king_danger_squares |= r_prime
+        attack_set &= (self.capture_mask | self.push_mask)
 
-        #S
-        ray = self.RAYS['S'][square]
-        masked_blockers = ray & blockers
+        if self.pinned & (1 << (63 - piece.square)):
+            attack_set &= self.pin_rays[piece.square]
 
-        if masked_blockers == 0 :
-            result |= ray
-            
-            if (piece_type == 'R' and self.board.active_piece == 'b') or (piece_type == 'r' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-
-        elif ((piece_type == 'R' and self.board.active_piece == 'b' and masked_blockers & ~self.board.black_king == 0) or (piece_type == 'r' and self.board.active_piece == 'w' and masked_blockers & ~self.board.white_king == 0)):
-            self.board.king_danger_squares |= ray
+        self.AddMoves(piece.square, attack_set)
 
+    def AttackersTo(self, square, occupancy, side):
+        """
+        bitboard of side's pieces that attack square, with sliders blocked by occupancy. occupancy is a python int, so
+        callers can take pieces off the board (or put them on) without touching the bitboards
+        """
+        if side == 'w':
+            # white pawns attacking square sit where a black pawn on square would capture
+            pawns = self.PAWN_TABLE['b'][square] & self.board.white_pawns
+            knights, king = self.board.white_knights, self.board.white_king
+            diagonal = self.board.white_bishops | self.board.white_queen
+            straight = self.board.white_rooks | self.board.white_queen
         else:
-            n = self.board.BitscanReverse(masked_blockers)
-
-            r = ray & ~self.RAYS['S'][self.board.BBToSquares(n)[0]]
+            pawns = self.PAWN_TABLE['w'][square] & self.board.black_pawns
+            knights, king = self.board.black_knights, self.board.black_king
+            diagonal = self.board.black_bishops | self.board.black_queen
+            straight = self.board.black_rooks | self.board.black_queen
 
-            result |= r 
+        return int(pawns | (self.KNIGHT_TABLE[square] & knights) | (self.KING_TABLE[square] & king)) | \
+            (BishopAttacks(square, occupancy) & int(diagonal)) | (RookAttacks(square, occupancy) & int(straight))
 
-            if piece_type == 'R' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = self.board.BitscanReverse(msbs_without_king)
-                r_prime = ray & ~self.RAYS['S'][self.board.BBToSquares(n_prime)[0]]
+    def EnemySide(self):
+        return 'b' if self.board.active_piece == 'w' else 'w'
 
-                self.board.king_danger_squares |= r_prime
-                
-            elif piece_type == 'r' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
+    def FilterKingMoves(self):
+        """
+        keep king moves onto squares no enemy piece attacks. The king is taken off the board first, so that squares
+        behind it along a slider's ray are still unsafe
+        """
+        occupancy = int(self.board.occupied) & ~int(self.board.SquareToBB(self.ally_king.square))
+        enemy = self.EnemySide()
+        filtered = 0
+        targets = int(self.king_pseudo_legal_bitboard)
 
-                n_prime = self.board.BitscanReverse(msbs_without_king)
-                r_prime = ray & ~self.RAYS['S'][self.board.BBToSquares(n_prime)[0]]
+        # only test the squares AddMoves keeps, the king's targets already exclude ally pieces
+        if not self.generate_quiets:
+            targets &= int(self.board.occupied)
 
-                self.board.king_danger_squares |= r_prime
+        if not self.generate_captures:
+            targets &= int(self.board.empty)
 
-        return result
+        for sq in IterSquares(targets):
+            if self.AttackersTo(sq, occupancy, enemy) == 0:
+                filtered |= 1 << (63 - sq)
 
+        self.AddMoves(self.ally_king.square, filtered)
 
-    def GetPossibleMoves(self, piece):
+    def IsAttacked(self, squares):
         """
-        For a given piece type and square, the function appends to the list of all possible moves, all moves for given piece at given square
-        Attacked squares bitboard is also calculated
-        """ 
-        if piece.name  == 'N':
-            attack_set = self.KNIGHT_TABLE[piece.square]
-
-            if self.board.active_piece == 'b':
-                self.board.king_danger_squares |= attack_set
-
-            elif self.board.active_piece == 'w' and self.number_of_attackers <= 1:
-                # filter ally move
-                attack_set &= (self.board.all_blacks | self.board.empty)
-                
-                if self.capture_mask != (2**64) - 1:
-                    attack_set &= ((self.capture_mask & piece.pinned_mask) | (self.push_mask & piece.pinned_mask))
-                else:
-                    # push mask will also be all 1s, but pinned mask has area between enemy slider and ally king and enemy piece, which is what we want
-                    attack_set &= piece.pinned_mask
-
-                for dest_sq in self.board.BBToSquares(attack_set):
-                    self.possible_moves.append(Move(piece, piece.square, dest_sq, '_'))
-
-        elif piece.name == 'n':
-            attack_set = self.KNIGHT_TABLE[piece.square] 
-
-            if self.board.active_piece == 'w':
-                self.board.king_danger_squares |= attack_set
-
-            elif self.board.active_piece == 'b' and self.number_of_attackers <= 1:
-                # filter ally move
-                attack_set &= (self.board.all_whites | self.board.empty)
-                
-                if self.capture_mask != (2**64) - 1:
-                    attack_set &= ((self.capture_mask & piece.pinned_mask) | (self.push_mask & piece.pinned_mask))
-                else:
-                    # push mask will also be all 1s, but pinned mask has area between enemy slider and ally king and enemy piece, which is what we want
-                    attack_set &= piece.pinned_mask
-
-                for dest_sq in self.board.BBToSquares(attack_set):
-                    self.possible_moves.append(Move(piece, piece.square, dest_sq, '_'))
-
-        elif piece.name == 'K':
-            attack_set = self.KING_TABLE[piece.square] 
-
-            if self.board.active_piece == 'w':
-                self.king_pseudo_legal_bitboard = attack_set & (self.board.all_blacks | self.board.empty)
-            
-            else:
-                self.board.king_danger_squares |= attack_set
-
-        elif piece.name == 'k':
-            attack_set = self.KING_TABLE[piece.square] 
-
-            if self.board.active_piece == 'b':
-                self.king_pseudo_legal_bitboard = attack_set & (self.board.all_whites | self.board.empty)
-            else:
-                self.board.king_danger_squares |= attack_set
-        
-        elif piece.name == 'B':
-            result = self.PossibleBishopMoves(piece.name, piece.square)
-
-            if self.board.active_piece == 'w' and self.number_of_attackers <= 1:
-                result &= (self.board.all_blacks | self.board.empty)
-
-                if self.capture_mask != (2**64) - 1:
-                    result &= ((self.capture_mask & piece.pinned_mask) | (self.push_mask & piece.pinned_mask))
-                else:
-                    # push mask will also be all 1s, but pinned mask has area between enemy slider and ally king and enemy piece, which is what we want
-                    result &= piece.pinned_mask
-         
-                for dest_sq in self.board.BBToSquares(result):
-                    self.possible_moves.append(Move(piece, piece.square, dest_sq, '_'))
-
-        elif piece.name == 'b':
-            result = self.PossibleBishopMoves(piece.name, piece.square)
-
-            if self.board.active_piece == 'b' and self.number_of_attackers <= 1:
-                result &= (self.board.all_whites | self.board.empty)
-                
-                if self.capture_mask != (2**64) - 1:
-                    result &= ((self.capture_mask & piece.pinned_mask) | (self.push_mask & piece.pinned_mask))
-                else:
-                    # push mask will also be all 1s, but pinned mask has area between enemy slider and ally king and enemy piece, which is what we want
-                    result &= piece.pinned_mask
-
-                for dest_sq in self.board.BBToSquares(result):
-                    self.possible_moves.append(Move(piece, piece.square, dest_sq, '_'))
-            
-        elif piece.name == 'R':
-            result = self.PossibleRookMoves(piece.name, piece.square)
-
-            if self.board.active_piece == 'w' and self.number_of_attackers <= 1:
-                result &= (self.board.all_blacks | self.board.empty)
-
-                if self.capture_mask != (2**64) - 1:
-                    result &= ((self.capture_mask & piece.pinned_mask) | (self.push_mask & piece.pinned_mask))
-                else:
-                    # push mask will also be all 1s, but pinned mask has area between enemy slider and ally king and enemy piece, which is what we want
-                    result &= piece.pinned_mask
-
-                for dest_sq in self.board.BBToSquares(result):
-                    self.possible_moves.append(Move(piece, piece.square, dest_sq, '_'))
-
-        elif piece.name == 'r':
-            result = self.PossibleRookMoves(piece.name, piece.square)
-
-            if self.board.active_piece == 'b' and self.number_of_attackers <= 1:
-                # check that there's 1 or less attackers,  beacuse then no moves are possible, except king moves out of check
-                result &= (self.board.all_whites | self.board.empty)
-                
-                if self.capture_mask != (2**64) - 1:
-                    result &= ((self.capture_mask & piece.pinned_mask) | (self.push_mask & piece.pinned_mask))
-                else:
-                    # push mask will also be all 1s, but pinned mask has area between enemy slider and ally king and enemy piece, which is what we want
-                    result &= piece.pinned_mask
-
-                for dest_sq in self.board.BBToSquares(result):
-                    self.possible_moves.append(Move(piece, piece.square, dest_sq, '_'))
-            
-        elif piece.name == 'Q':
-            result = self.PossibleBishopMoves('B', piece.square) | self.PossibleRookMoves('R', piece.square)
-
-            if self.board.active_piece == 'w' and self.number_of_attackers <= 1:
-                result &= (self.board.all_blacks | self.board.empty)
-                
-                if self.capture_mask != (2**64) - 1:
-                    result &= ((self.capture_mask & piece.pinned_mask) | (self.push_mask & piece.pinned_mask))
-                else:
-                    # push mask will also be all 1s, but pinned mask has area between enemy slider and ally king and enemy piece, which is what we want
-                    result &= piece.pinned_mask
-
-                for dest_sq in self.board.BBToSquares(result):
-                    self.possible_moves.append(Move(piece, piece.square, dest_sq, '_'))
-
-        elif piece.name == 'q':
-            result = self.PossibleBishopMoves('b', piece.square) | self.PossibleRookMoves('r', piece.square)
-
-            if self.board.active_piece == 'b' and self.number_of_attackers <= 1:
-                result &= (self.board.all_whites | self.board.empty)
-
-                if self.capture_mask != (2**64) - 1:
-                    result &= ((self.capture_mask & piece.pinned_mask) | (self.push_mask & piece.pinned_mask))
-                else:
-                    # push mask will also be all 1s, but pinned mask has area between enemy slider and ally king and enemy piece, which is what we want
-                    result &= piece.pinned_mask
-
-                for dest_sq in self.board.BBToSquares(result):
-                    self.possible_moves.append(Move(piece, piece.square, dest_sq, '_'))
-    
-
-    def FilterKingMoves(self):
-        filtered = self.king_pseudo_legal_bitboard & ~self.board.king_danger_squares
+        is any square in the bitboard squares attacked by the enemy
+        """
+        occupancy = int(self.board.occupied)
+        enemy = self.EnemySide()
 
-        for dest_sq in self.board.BBToSquares(filtered):
-            self.possible_moves.append(Move(self.ally_king, self.ally_king.square, dest_sq, '_'))
+        return any(self.AttackersTo(sq, occupancy, enemy) for sq in IterSquares(int(squares)))
 
     def IsEnemyPiece(self, piece):
         return piece.colour != self.board.active_piece
@@ -1009,49 +416,9 @@ class GenerateMoves:
         return piece.colour == self.board.active_piece
 
     def GetAttackers(self):
-        ally_king_square = self.ally_king.square
-        self.board.attackers = np.uint64(0)
-
-        for piece in self.board.pieces:
-            if self.IsEnemyPiece(piece) and (piece.name != 'K' or piece.name != 'k'):
-                # is enemy piece and not king
-
-                if piece.name == 'N':
-                    self.board.attackers |= (self.KNIGHT_TABLE[ally_king_square] & self.board.white_knights)
-                
-                elif piece.name == 'n':
-                    self.board.attackers |= (self.KNIGHT_TABLE[ally_king_square] & self.board.black_knights)
-
-                elif piece.name == 'B':
-                    
-                    self.board.attackers |= (self.PossibleBishopMoves('B', ally_king_square) & self.board.white_bishops)
-
-                elif piece.name == 'b':
-                    self.board.attackers |= (self.PossibleBishopMoves('b', ally_king_square) & self.board.black_bishops)
-
-                elif piece.name == 'R':
-                    self.board.attackers |= (self.PossibleRookMoves('R', ally_king_square) & self.board.white_rooks)
-
-                elif piece.name == 'r':
-                    self.board.attackers |= (self.PossibleRookMoves('r', ally_king_square) & self.board.black_rooks)
-
-                elif piece.name == 'Q':
-                    queen_moves = self.PossibleBishopMoves('B', ally_king_square) | self.PossibleRookMoves('R', ally_king_square)
-                    self.board.attackers |= (queen_moves & self.board.white_queen)
-                
-                elif piece.name == 'q':
-                    queen_moves = self.PossibleBishopMoves('b', ally_king_square) | self.PossibleRookMoves('r', ally_king_square)
-                    self.board.attackers |= (queen_moves & self.board.black_queen)
-
-                elif piece.name == 'P':
-                    if (self.PossibleWhitePawnKingAttacks(piece.square) & self.board.black_king) != 0:
-                        self.board.attackers |= self.board.SquareToBB(piece.square)
-
-                elif piece.name == 'p':
-                    if (self.PossibleBlackPawnKingAttacks(piece.square) & self.board.white_king) != 0:
-                        self.board.attackers |= self.board.SquareToBB(piece.square)
+        self.board.attackers = self.AttackersTo(self.ally_king.square, int(self.board.occupied), self.EnemySide())
         
-        if self.board.attackers in self.board.all_squares:
+        if IsSingleBit(self.board.attackers):
             self.number_of_attackers = 1
         
         elif self.board.attackers == 0:
@@ -1060,203 +427,331 @@ class GenerateMoves:
         else:
             self.number_of_attackers = 2 # set to arbitrary number > 1
 
-    def GetPushMask(self, king_square, attacker):
-        blocker = self.board.SquareToBB(king_square)
+    def StaticExchange(self, move, piece_values):
+        """
+        material won by the capture sequence move starts on its destination square, with each side recapturing with
+        its least valuable attacker and free to stop when recapturing would lose material. Pieces moved off the square's
+        lines uncover the sliders behind them, as AttackersTo is asked again with the updated occupancy
+        """
+        from_sq, to_sq, flag = (move >> 6) & 63, move & 63, move & 0xf000
+        piece = self.board.GetPieceOnSquare(from_sq)
+
+        occupancy = int(self.board.occupied) & ~(1 << (63 - from_sq))
+
+        if flag == EP_CAPTURE:
+            captured_sq = to_sq + 8 if piece.colour == 'w' else to_sq - 8
+            occupancy &= ~(1 << (63 - captured_sq))
+            gains = [piece_values['p']]
+        else:
+            target = self.board.GetPieceOnSquare(to_sq)
+            gains = [0 if target is None else piece_values[target.name]]
 
-        if attacker.name == 'R' or attacker.name == 'r':
-            dirs = ['N', 'E', 'W', 'S']
-            
-        elif attacker.name == 'B' or attacker.name == 'b':
-            dirs = ['NE', 'NW', 'SE', 'SW']
+        # value of the piece standing on the square, which the next capture takes
+        on_square = piece_values.get(piece.name, KING_VALUE)
+        side = 'b' if piece.colour == 'w' else 'w'
 
-        elif attacker.name == 'Q' or attacker.name == 'q':
-            dirs = ['N', 'E', 'W', 'S', 'NE', 'NW', 'SE', 'SW']
+        while True:
+            attackers = self.AttackersTo(to_sq, occupancy, side) & occupancy
+
+            if attackers == 0:
+                break
+
+            for name in ('PNBRQK' if side == 'w' else 'pnbrqk'):
+                least_valuable = attackers & int(self.board.GetBitboard(name))
+
+                if least_valuable:
+                    least_valuable &= -least_valuable
+                    break
+
+            gains.append(on_square - gains[-1])
+            on_square = piece_values.get(name, KING_VALUE)
+            occupancy &= ~least_valuable
+            side = 'b' if side == 'w' else 'w'
+
+            if name in 'Kk' and self.AttackersTo(to_sq, occupancy, side) & occupancy:
+                # king can't recapture onto a defended square
+                gains.pop()
+                break
+
+        while len(gains) > 1:
+            last = gains.pop()
+            gains[-1] = -max(-gains[-1], last)
+
+        return gains[0]
 
-        for dir in dirs:
-            ray = self.RAYS[dir][attacker.square] 
-            if (ray & blocker) != 0:
-                return ray & ~self.RAYS[dir][king_square]
-        
     def SetMoveFilters(self):
         # set capture and push masks, these are for non-king pieces
 
         if self.number_of_attackers == 1:
             self.capture_mask = self.board.attackers
 
-            # setup push mask....
-            attacker = self.board.GetPiecesOnBitboard(self.board.attackers)[0]
-
-            # if piece is a slider
-            if attacker.name in ['Q', 'R', 'B', 'q', 'r', 'b']:
-                self.push_mask = self.GetPushMask(self.ally_king.square, attacker)
-            else:
-                self.push_mask = np.uint64(0)
+            # block a slider by moving between it and the king. Non sliders can't be blocked, and are never on a line
+            # with a square between them and the king
+            self.push_mask = BETWEEN[self.ally_king.square][LSBSquare(int(self.board.attackers))]
         
         elif self.number_of_attackers == 0:
             self.capture_mask = (2**64) - 1
             self.push_mask = (2**64) - 1
 
         else:
-            self.capture_mask = np.uint64(0)
-            self.push_mask = np.uint64(0)
+            self.capture_mask = self.board.U64(0)
+            self.push_mask = self.board.U64(0)
 
-    def SetPinnedMasks(self):
+    def XRayBlockers(self, king_square, straight, diagonal, pieces):
         """
-        all pieces except for kings can be pinned
-
-        for each possible direction from ally king, look at rays from enemy sliders in opposite direction, find intersection
+        x-ray sliders from king_square through pieces. Returns the pieces that stand alone between king_square and a
+        slider in straight (rooks, queens) or diagonal (bishops, queens), mapped to the square of that slider
         """
-        # initialise
-        for piece in self.board.pieces:
-            piece.pinned_mask = (2**64) - 1
+        occupancy = int(self.board.occupied)
+        blockers = {}
 
-        if self.board.active_piece == 'w':
-            enemy_sliders = self.board.GetPiecesOnBitboard(self.board.black_bishops | self.board.black_queen | self.board.black_rooks)
-            enemy_pieces = self.board.all_blacks | self.board.black_king
+        for attacks, sliders in ((RookAttacks, straight), (BishopAttacks, diagonal)):
+            in_the_way = attacks(king_square, occupancy) & pieces
 
-            pins = self.board.all_whites
+            for slider in IterSquares(attacks(king_square, occupancy & ~in_the_way) & sliders):
+                blocker = BETWEEN[king_square][slider] & pieces
 
-            ep_discovery_pawn = self.board.black_pawns
-            ally_pawn = self.board.white_pawns
+                if IsSingleBit(blocker):
+                    blockers[LSBSquare(blocker)] = slider
 
-        else:
-            enemy_sliders = self.board.GetPiecesOnBitboard(self.board.white_bishops | self.board.white_queen | self.board.white_rooks)
-            enemy_pieces = self.board.all_whites | self.board.black_king
+        return blockers
+
+    def SetPins(self):
+        """
+        all pieces except for kings can be pinned
 
-            pins = self.board.all_blacks
+        a pinned piece stands alone between the ally king and an enemy slider, and may then only move along the line
+        through them
+        """
+        king_square = self.ally_king.square
 
-            ep_discovery_pawn = self.board.white_pawns
-            ally_pawn = self.board.black_pawns
+        if self.board.active_piece == 'w':
+            pins = self.XRayBlockers(king_square, int(self.board.black_rooks | self.board.black_queen), int(self.board.black_bishops | self.board.black_queen), int(self.board.all_whites))
+        else:
+            pins = self.XRayBlockers(king_square, int(self.board.white_rooks | self.board.white_queen), int(self.board.white_bishops | self.board.white_queen), int(self.board.all_blacks))
 
-        # non-diagonal
-        for dir in ['N', 'E', 'W', 'S']:
-            for piece in enemy_sliders:
-                possible_mask = self.RAYS[self.opposite_dir[dir]][piece.square] & self.RAYS[dir][self.ally_king.square]
-                
-                if piece.name in ['R', 'r', 'Q', 'q'] and (possible_mask & enemy_pieces == 0 or possible_mask & ep_discovery_pawn in self.board.all_squares) and possible_mask & pins in self.board.all_squares:
-                    pinned_piece = self.board.GetPiecesOnBitboard(possible_mask & pins)[0]
+        self.pinned = 0
+        # pinned square -> squares it may move to. Its attacks stop at the king and the pinner, so the full line is as
+        # good as the squares between them
+        self.pin_rays = {}
 
-        
-                    if (possible_mask & ep_discovery_pawn in self.board.all_squares) and (possible_mask & ally_pawn != 0):
-                        # tricky en-passant pin. Identify en-passant square. Pinned mask for 'pinned' piece is ~ep square 
+        for square, pinner in pins.items():
+            self.pinned |= 1 << (63 - square)
+            self.pin_rays[square] = LINE[king_square][pinner]
 
-                        if self.board.active_piece == 'b':
-                            ep_square = self.board.BBToSquares(possible_mask & ep_discovery_pawn)[0] + 8
-                        else:
-                            ep_square = self.board.BBToSquares(possible_mask & ep_discovery_pawn)[0] - 8
+    def SetDiscoverers(self):
+        """
+        ally pieces, king included, that block an ally slider from the enemy king. Moving one off that line gives
+        check
+        """
+        king_square = self.enemy_king.square
+
+        if self.board.active_piece == 'w':
+            blockers = self.XRayBlockers(king_square, int(self.board.white_rooks | self.board.white_queen), int(self.board.white_bishops | self.board.white_queen), int(self.board.all_whites | self.board.white_king))
+        else:
+            blockers = self.XRayBlockers(king_square, int(self.board.black_rooks | self.board.black_queen), int(self.board.black_bishops | self.board.black_queen), int(self.board.all_blacks | self.board.black_king))
 
-                        pinned_piece.pinned_mask = ~self.board.SquareToBB(ep_square)
+        self.discoverers = 0
 
-                    else:
-                        pinned_piece.pinned_mask = possible_mask | self.board.SquareToBB(piece.square) # add enemy slider to pinned mask
+        for square in blockers:
+            self.discoverers |= 1 << (63 - square)
 
-        # diagonal
-        for dir in ['NE', 'SE', 'NW', 'SW']:
-            for piece in enemy_sliders:
-                possible_mask = self.RAYS[self.opposite_dir[dir]][piece.square] & self.RAYS[dir][self.ally_king.square]
+    def IsLegalEP(self, from_sq, to_sq):
+        """
+        en-passant takes two pawns off the same rank at once, which can expose the king to a slider along that rank
+        even though neither pawn is pinned on its own
+        """
+        captured_sq = to_sq + 8 if self.board.active_piece == 'w' else to_sq - 8
+        occupancy = int(self.board.occupied) & ~(1 << (63 - from_sq)) & ~(1 << (63 - captured_sq)) | (1 << (63 - to_sq))
 
-                if piece.name in ['Q', 'q', 'B', 'b'] and possible_mask & enemy_pieces == 0 and possible_mask & pins in self.board.all_squares:
-                    pinned_piece = self.board.GetPiecesOnBitboard(possible_mask & pins)[0]
+        if self.board.active_piece == 'w':
+            straight = int(self.board.black_rooks | self.board.black_queen)
+            diagonal = int(self.board.black_bishops | self.board.black_queen)
+        else:
+            straight = int(self.board.white_rooks | self.board.white_queen)
+            diagonal = int(self.board.white_bishops | self.board.white_queen)
 
-                    pinned_piece.pinned_mask = possible_mask | self.board.SquareToBB(piece.square) # add enemy slider to pinned mask
+        king_square = self.ally_king.square
 
+        return (RookAttacks(king_square, occupancy) & straight) == 0 and (BishopAttacks(king_square, occupancy) & diagonal) == 0
 
     def GetAllyKing(self):
-        return list(filter(lambda piece : self.IsAllyPiece(piece) and (piece.name == 'K' or piece.name == 'k'), self.board.pieces))[0]
+        king = self.board.white_king if self.board.active_piece == 'w' else self.board.black_king
+
+        return self.board.GetPieceOnSquare(LSBSquare(int(king)))
 
     def GetEnemyKing(self):
-        return list(filter(lambda piece : self.IsEnemyPiece(piece) and (piece.name == 'K' or piece.name == 'k'), self.board.pieces))[0]
+        king = self.board.black_king if self.board.active_piece == 'w' else self.board.white_king
+
+        return self.board.GetPieceOnSquare(LSBSquare(int(king)))
     
     def AddCastlingMoves(self):
         """
         perform all necessary checks, if castling move possible, add it to list of possible moves for ally king
         """
-        
-        if self.ally_king.colour == 'w' and 'K' in self.board.castling_rights and self.board.IsSquareOccupied(63):
-            # white king kingside castling
-            rook, danger = self.get_castling_masks('CK', 'R', 'd')
-            non_movement = self.board.GetPieceOnSquare(63).times_moved == 0 and self.ally_king.times_moved == 0
-            ray = danger & ~self.board.white_king
-
-            if (rook & self.board.white_rooks) == rook and (danger & self.board.king_danger_squares) == 0 and (ray & self.board.occupied) == 0 and non_movement:
-                # kingside castling possible
-                self.possible_moves.append(Move(self.ally_king, self.ally_king.square, self.ally_king.square + 2, 'CK'))
-
-        if self.ally_king.colour == 'w' and 'Q' in self.board.castling_rights and self.board.IsSquareOccupied(56):
-            # white king queenside castling
-            rook, danger = self.get_castling_masks('CQ', 'R', 'd')
-            non_movement = self.board.GetPieceOnSquare(56).times_moved == 0 and self.ally_king.times_moved == 0
-            ray = danger & ~self.board.white_king
-
-            if (rook & self.board.white_rooks) == rook and (danger & self.board.king_danger_squares) == 0 and (ray & self.board.occupied) == 0 and non_movement:
-                # kingside castling possible
-                self.possible_moves.append(Move(self.ally_king, self.ally_king.square, self.ally_king.square - 3, 'CQ'))
-
-        if self.ally_king.colour == 'b' and 'k' in self.board.castling_rights and self.board.IsSquareOccupied(7):
-            # white king queenside castling
-            rook, danger = self.get_castling_masks('Ck', 'r', 'd')
-            non_movement = self.board.GetPieceOnSquare(7).times_moved == 0 and self.ally_king.times_moved == 0
-            ray = danger & ~self.board.black_king
-
-            if (rook & self.board.black_rooks) == rook and (danger & self.board.king_danger_squares) == 0 and (ray & self.board.occupied) == 0 and non_movement:
-                # kingside castling possible
-                self.possible_moves.append(Move(self.ally_king, self.ally_king.square, self.ally_king.square + 2, 'Ck'))
-
-        if self.ally_king.colour == 'b' and 'q' in self.board.castling_rights and self.board.IsSquareOccupied(0):
-            # white king queenside castling
-            rook, danger = self.get_castling_masks('Cq', 'r', 'd')
-            non_movement = self.board.GetPieceOnSquare(0).times_moved == 0 and self.ally_king.times_moved == 0
-            ray = danger & ~self.board.black_king
-
-            if (rook & self.board.black_rooks) == rook and (danger & self.board.king_danger_squares) == 0 and (ray & self.board.occupied) == 0 and non_movement:
-                # kingside castling possible
-                self.possible_moves.append(Move(self.ally_king, self.ally_king.square, self.ally_king.square - 3, 'Cq'))
+        if self.ally_king.colour == 'w':
+            castles = ((WHITE_KINGSIDE, 63, KING_CASTLE), (WHITE_QUEENSIDE, 56, QUEEN_CASTLE))
+            rooks = int(self.board.white_rooks)
+        else:
+            castles = ((BLACK_KINGSIDE, 7, KING_CASTLE), (BLACK_QUEENSIDE, 0, QUEEN_CASTLE))
+            rooks = int(self.board.black_rooks)
 
-    def GenerateAllPossibleMoves(self):
-        # reset attacked squares bitboard, and possible moves list
-        self.board.attacked_squares = np.uint64(0)
-        self.king_pseudo_legal_bitboard = np.uint64(0)
+        king_square = self.ally_king.square
 
-        self.possible_moves = []
+        for right, rook_square, flag in castles:
+            if self.board.castling_rights & right and rooks & (1 << (63 - rook_square)):
+                king_to = king_square + 2 if flag == KING_CASTLE else king_square - 2
 
+                # squares between king and rook must be empty, the king must not pass through or land on an attacked square
+                if BETWEEN[king_square][rook_square] & int(self.board.occupied) == 0 and not self.IsAttacked(BETWEEN[king_square][king_to] | (1 << (63 - king_to))):
+                    self.move_buffer.append(EncodeMove(king_square, king_to, flag))
+
+    def SetUpMoveFilters(self):
+        """
+        work out everything move generation needs to know about the position: kings, pieces giving check, capture
+        and push masks, pins and squares the ally king can't move to. Done once per position and shared by all of
+        the generators below
+        """
         self.ally_king = self.GetAllyKing()
         self.enemy_king = self.GetEnemyKing()
 
         #s = time.time()
         self.GetAttackers()
         self.SetMoveFilters() 
-        self.SetPinnedMasks() 
+        self.SetPins() 
         #e = time.time()
         #print(f"Masks and filters: {e-s}seconds")
 
-        # THIS MUST STAY HERE ****************************
-                                                        
-        self.board.king_danger_squares = np.uint64(0)  
+        self.discoverers = None # worked out by GivesCheck when first needed
+
+        self.filters_stale = False
+
+    def GenerateMoves(self, captures, quiets):
+        """
+        legal moves of the position. captures: captures, en-passant and promotions. quiets: every other move,
+        castling included
+        """
+        if self.filters_stale:
+            self.SetUpMoveFilters()
+
+        self.generate_captures = captures
+        self.generate_quiets = quiets
 
-        #*************************************************
+        self.king_pseudo_legal_bitboard = self.board.U64(0)
+        self.move_buffer = array('H')
 
         # pawn moves, pawns code does all possible moves for all pawns on board in one go, so doesn't go into for loop
         #s = time.time()
-        self.PossibleWhitePawnMoves()
-        self.PossibleBlackPawnMoves()
+        self.AddPawnMovesSetwise()
         #e = time.time()
         #print(f"Pawn moves: {e-s} seconds")
 
-        # only pawns have moves set. We need to filter out pawn moves that aren't valid because pawn is pinned. Use pinned mask for this
-        self.possible_moves = list(filter(lambda move : move.dest in self.board.BBToSquares(move.piece.pinned_mask), self.possible_moves))
-        
         #s = time.time()
         for piece in self.board.pieces:
-            if piece.name != 'P' and piece.name != 'p':
+            if piece.colour == self.board.active_piece and piece.name != 'P' and piece.name != 'p':
                 self.GetPossibleMoves(piece)
         #e = time.time()
         #print(f"Other moves: {e-s}seconds")
 
         self.FilterKingMoves()
 
-        if self.board.castling_rights != '' and self.board.attackers == 0:
+        if quiets and self.board.castling_rights != 0 and self.board.attackers == 0:
             self.AddCastlingMoves()
 
+        return self.move_buffer
+
+    def GenerateAllPossibleMoves(self):
+        self.possible_moves = self.GenerateMoves(True, True)
+
+    def CountLegalMoves(self):
+        """
+        number of legal moves, without encoding them. Moves found set-wise are popcounted, en-passant and castling
+        still go through the move buffer as they're checked one at a time
+        """
+        self.count_only = True
+        self.move_count = 0
+
+        try:
+            self.GenerateMoves(True, True)
+        finally:
+            self.count_only = False
+
+        return self.move_count + len(self.move_buffer)
+
+    def GenerateCaptures(self):
+        """
+        legal captures and promotions, for quiescence search and staged move picking
+        """
+        return self.GenerateMoves(True, False)
+
+    def GenerateQuiets(self):
+        """
+        legal moves that are neither captures nor promotions
+        """
+        return self.GenerateMoves(False, True)
+
+    def GenerateQuietChecks(self):
+        return array('H', [move for move in self.GenerateQuiets() if self.GivesCheck(move)])
+
+    def GivesCheck(self, move):
+        """
+        does a legal move give check, directly or by uncovering an ally slider. Works out the occupancy after the
+        move instead of making it
+        """
+        from_sq, to_sq, flag = (move >> 6) & 63, move & 63, move & 0xf000
+        piece = self.board.GetPieceOnSquare(from_sq)
+        enemy_king = int(self.board.SquareToBB(self.enemy_king.square))
+        white = piece.colour == 'w'
+
+        # squares emptied by the move
+        vacated = 1 << (63 - from_sq)
+        occupancy = int(self.board.occupied) & ~vacated | (1 << (63 - to_sq))
+
+        if flag == EP_CAPTURE:
+            occupancy &= ~(1 << (63 - (to_sq + 8 if white else to_sq - 8)))
+
+        elif flag == KING_CASTLE or flag == QUEEN_CASTLE:
+            rook_from, rook_to = (from_sq + 3, from_sq + 1) if flag == KING_CASTLE else (from_sq - 4, from_sq - 1)
+            vacated |= 1 << (63 - rook_from)
+            occupancy = occupancy & ~vacated | (1 << (63 - rook_to))
+
+            if RookAttacks(rook_to, occupancy) & enemy_king:
+                return True
+
+        # the moved piece, or the piece it promotes to
+        name = piece.name.upper() if not flag & PROMOTION else PromotionPiece(move)
+
+        if name == 'P':
+            if self.PAWN_TABLE[piece.colour][to_sq] & enemy_king:
+                return True
+
+        elif name == 'N' and self.KNIGHT_TABLE[to_sq] & enemy_king:
+            return True
+
+        elif name in ('B', 'Q') and BishopAttacks(to_sq, occupancy) & enemy_king:
+            return True
+
+        elif name in ('R', 'Q') and RookAttacks(to_sq, occupancy) & enemy_king:
+            return True
+
+        if flag != EP_CAPTURE and flag != KING_CASTLE and flag != QUEEN_CASTLE:
+            # discovered check, the moved piece leaves the line between an ally slider and the enemy king
+            if self.discoverers is None:
+                self.SetDiscoverers()
+
+            return self.discoverers & vacated != 0 and LINE[self.enemy_king.square][from_sq] & (1 << (63 - to_sq)) == 0
+
+        # en-passant and castling move two pieces, so look for discovered checks with the occupancy after the move.
+        # Bitboards haven't been updated, so leave out the squares the moved pieces came from
+        if white:
+            diagonal, straight = self.board.white_bishops | self.board.white_queen, self.board.white_rooks | self.board.white_queen
+        else:
+            diagonal, straight = self.board.black_bishops | self.board.black_queen, self.board.black_rooks | self.board.black_queen
+
+        enemy_king_square = self.enemy_king.square
+
+        return (BishopAttacks(enemy_king_square, occupancy) & int(diagonal) & ~vacated) != 0 or (RookAttacks(enemy_king_square, occupancy) & int(straight) & ~vacated) != 0
+
 if __name__ == "main":
     moveGen = GenerateMoves()
 
@@ -0,0 +1,127 @@
+"""
+Move ordering
+
+alpha-beta cuts off sooner the earlier the best move is searched, so moves are tried in order of how likely they are
+to be good:
+
+1. the transposition table move, best move last time this position was searched
+2. captures and promotions, most valuable victim first, least valuable attacker breaking ties (MVV-LVA)
+3. killers, quiet moves that caused a cutoff at the same ply elsewhere in the tree
+4. other quiet moves, by history: how often the move has caused cutoffs, weighted by depth
+
+moves are picked one at a time instead of sorted, as a cutoff usually comes before most of the list is needed
+"""
+from array import array
+from move import CAPTURE, EP_CAPTURE, PROMOTION, PromotionPiece
+
+MAX_PLY = 128
+
+TT_MOVE_SCORE = 1000000
+CAPTURE_SCORE = 100000
+KILLER_SCORES = (90000, 89000)
+# history scores are kept below the killers
+HISTORY_MAX = 80000
+
+# piece values for MVV-LVA, only the order matters
+MVV_LVA_VALUES = {'P': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 10}
+
+
+class MoveOrdering:
+    def __init__(self):
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+
+        # indexed by side to move, from square and to square: side << 12 | from << 6 | to
+        self.history = array('l', [0]) * (2 * 64 * 64)
+
+        # cutoff statistics
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def NewSearch(self):
+        """
+        killers are specific to the last search's tree, history is kept but worth less
+        """
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+
+        for i in range(len(self.history)):
+            self.history[i] >>= 1
+
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def ScoreMove(self, board, move, tt_move, ply):
+        if move == tt_move:
+            return TT_MOVE_SCORE
+
+        if move & CAPTURE or move & PROMOTION:
+            score = CAPTURE_SCORE
+
+            if move & PROMOTION:
+                score += 10 * MVV_LVA_VALUES[PromotionPiece(move)]
+
+            if move & 0xf000 == EP_CAPTURE:
+                score += 10 * MVV_LVA_VALUES['P'] - MVV_LVA_VALUES['P']
+            elif move & CAPTURE:
+                victim = board.GetPieceOnSquare(move & 63)
+                attacker = board.GetPieceOnSquare((move >> 6) & 63)
+                score += 10 * MVV_LVA_VALUES[victim.name.upper()] - MVV_LVA_VALUES[attacker.name.upper()]
+
+            return score
+
+        if ply < MAX_PLY:
+            if move == self.killers[ply][0]:
+                return KILLER_SCORES[0]
+            if move == self.killers[ply][1]:
+                return KILLER_SCORES[1]
+
+        return self.history[self.HistoryIndex(board, move)]
+
+    @staticmethod
+    def HistoryIndex(board, move):
+        return (board.active_piece == 'b') << 12 | move & 0xfff
+
+    def OrderedMoves(self, board, moves, tt_move, ply):
+        """
+        yield moves best first. Each step picks the best of the moves left (selection sort), so moves after a cutoff
+        are never ordered
+        """
+        moves = list(moves)
+        scores = [self.ScoreMove(board, move, tt_move, ply) for move in moves]
+
+        for i in range(len(moves)):
+            best = max(range(i, len(moves)), key=scores.__getitem__)
+
+            moves[i], moves[best] = moves[best], moves[i]
+            scores[i], scores[best] = scores[best], scores[i]
+
+            yield moves[i]
+
+    def Cutoff(self, board, move, depth, ply, move_number):
+        """
+        move caused a beta cutoff, move_number is its position in the order moves were searched
+        """
+        self.cutoffs += 1
+
+        if move_number == 0:
+            self.first_move_cutoffs += 1
+
+        if move & CAPTURE or move & PROMOTION:
+            return
+
+        if ply < MAX_PLY and self.killers[ply][0] != move:
+            self.killers[ply][1] = self.killers[ply][0]
+            self.killers[ply][0] = move
+
+        index = self.HistoryIndex(board, move)
+        self.history[index] += depth * depth
+
+        if self.history[index] > HISTORY_MAX:
+            # keep history under the killers, halving everything keeps the order between moves
+            for i in range(len(self.history)):
+                self.history[i] >>= 1
+
+    def FirstMoveCutoffRate(self):
+        """
+        fraction of cutoffs caused by the first move searched, the closer to 1 the better the ordering
+        """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0
@@ -0,0 +1,128 @@
+"""
+Perft divergence bisection
+
+compares perft divide of the move generator with the reference generator in referenceMoveGen.py. When a count is
+off, it follows the first move whose count differs into the position after it, one depth lower, until it finds a
+position whose legal moves differ. That position is the smallest failing case, printed as a fen.
+
+if the counts below a wrong move all agree when searched from the position after it, the error only shows when the
+move is made by the generator itself, so make/unmake left some state behind. Then the position before the move is
+printed instead.
+
+reference results are slow to get, so they're cached in perft_reference_cache.json by fen and depth.
+
+python perftBisect.py "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1" 4
+"""
+from chessLogic import ChessLogic
+from engine import Engine
+import referenceMoveGen
+import argparse
+import json
+import os
+
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'perft_reference_cache.json')
+
+
+class ReferenceCache:
+    def __init__(self, path=DEFAULT_CACHE):
+        self.path = path
+        self.results = {}
+
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.results = json.load(f)
+
+    def Divide(self, fen, depth):
+        key = f"{fen}|{depth}"
+
+        if key not in self.results:
+            self.results[key] = referenceMoveGen.Divide(fen, depth)
+
+            if self.path:
+                with open(self.path, 'w') as f:
+                    json.dump(self.results, f)
+
+        return self.results[key]
+
+
+def Divide(fen, depth):
+    """
+    {move: perft of the position after it} from the move generator, moves as lowercase uci strings
+    """
+    engine = Engine(tt_size_mb=0)
+    engine.chess = ChessLogic(fen)
+    divide = {}
+
+    for move in list(engine.chess.GetLegalMoves()):
+        move_string = engine.chess.MoveToString(move).lower()
+
+        engine.chess.MakeMove(move)
+        divide[move_string] = engine.Perft(depth - 1, False)
+        engine.chess.UnmakeMove()
+
+    return divide
+
+
+def Bisect(fen, depth, cache):
+    """
+    follow mismatching counts down from fen. Returns (failing fen, moves played to reach it, extra moves, missing
+    moves), or None if the counts agree. If extra and missing are both empty, the count after the last move of the line
+    is only wrong when it's made from the failing fen, an incremental state divergence
+    """
+    line = []
+    parent = None
+
+    while depth >= 1:
+        mine = Divide(fen, depth)
+        reference = cache.Divide(fen, depth)
+
+        extra = sorted(set(mine) - set(reference))
+        missing = sorted(set(reference) - set(mine))
+
+        if extra or missing:
+            return fen, line, extra, missing
+
+        wrong = [move for move in sorted(mine) if mine[move] != reference[move]]
+
+        if not wrong:
+            if parent is None:
+                return None
+
+            return parent, line, [], []
+
+        move = wrong[0]
+        print(f"depth {depth} | {move}: {mine[move]} (reference {reference[move]}) | {fen}")
+
+        # the reference generator works out the next position, so a bug in make/unmake can't hide in it
+        parent = fen
+        fen = referenceMoveGen.Position(fen).Make(move).Fen()
+        line.append(move)
+        depth -= 1
+
+    return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='find the smallest position where perft differs from the reference generator')
+    parser.add_argument('fen')
+    parser.add_argument('depth', type=int)
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help='json file of reference results')
+    parser.add_argument('--no-cache', action='store_true', help="don't read or write cached reference results")
+    args = parser.parse_args()
+
+    result = Bisect(args.fen, args.depth, ReferenceCache(None if args.no_cache else args.cache))
+
+    if result is None:
+        print(f"perft {args.depth} matches the reference")
+    else:
+        fen, line, extra, missing = result
+
+        if not extra and not missing:
+            print(f"\nincremental state divergence after: {' '.join(line[:-1]) or '(start)'}")
+            print(f"fen: {fen}")
+            print(f"{line[-1]} gives the wrong count when made here, but the position after it counts right")
+        else:
+            print(f"\nmoves differ after: {' '.join(line) if line else '(start)'}")
+            print(f"fen: {fen}")
+            print(f"extra moves: {' '.join(extra) or '-'}")
+            print(f"missing moves: {' '.join(missing) or '-'}")
@@ -0,0 +1,116 @@
+"""
+Perft regression suite
+
+runs every position in perft_suite.epd to a depth and checks the node count against the expected one. Each line of
+the suite is a fen followed by expected counts, in the usual epd perft format:
+
+rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1 ;D1 20 ;D2 400 ;D3 8902
+
+each position is run at the deepest depth it has a count for, up to --depth. Results are printed as a table and can
+be written as json, to compare speed between commits.
+
+python perftSuite.py --depth 4 --workers 4 --json results.json
+"""
+from concurrent.futures import ProcessPoolExecutor
+from chessLogic import ChessLogic
+from engine import Engine
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+DEFAULT_SUITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'perft_suite.epd')
+
+
+def LoadSuite(path):
+    """
+    list of (fen, {depth: expected count})
+    """
+    suite = []
+
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+
+            if not line or line.startswith('#'):
+                continue
+
+            fen, *counts = [field.strip() for field in line.split(';')]
+            expected = {}
+
+            for count in counts:
+                depth, nodes = count.split()
+                expected[int(depth[1:])] = int(nodes)
+
+            suite.append((fen, expected))
+
+    return suite
+
+
+def RunPosition(fen, depth, expected):
+    engine = Engine(tt_size_mb=0)
+    engine.chess = ChessLogic(fen)
+
+    start = time.time()
+    nodes = engine.Perft(depth, False)
+    time_taken = time.time() - start
+
+    return {'fen': fen, 'depth': depth, 'expected': expected, 'nodes': nodes, 'passed': nodes == expected,
+            'time': time_taken, 'nps': nodes / time_taken if time_taken else 0}
+
+
+def RunSuite(suite, max_depth, workers=1):
+    """
+    run every position at the deepest depth it has a count for, up to max_depth. With more than one worker,
+    positions are shared out over a process pool
+    """
+    jobs = []
+
+    for fen, expected in suite:
+        depths = [depth for depth in expected if depth <= max_depth]
+
+        if depths:
+            jobs.append((fen, max(depths), expected[max(depths)]))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(RunPosition, *zip(*jobs)))
+
+    return [RunPosition(*job) for job in jobs]
+
+
+def PrintResults(results, wall_time):
+    for result in results:
+        status = 'PASS' if result['passed'] else 'FAIL'
+        print(f"{status} | D{result['depth']} | {result['nodes'] : >9} / {result['expected'] : >9} | {result['time'] : 8.3f}s | {result['nps'] : >10.0f} nps | {result['fen']}")
+
+    nodes = sum(result['nodes'] for result in results)
+    failed = sum(not result['passed'] for result in results)
+
+    print(f"\n{len(results) - failed}/{len(results)} passed | {nodes} nodes | {wall_time : .3f}s wall time | {nodes / wall_time : .0f} nps")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='perft regression suite')
+    parser.add_argument('--suite', default=DEFAULT_SUITE, help='epd file of positions and expected counts')
+    parser.add_argument('--depth', type=int, default=3, help='deepest depth to run each position at')
+    parser.add_argument('--workers', type=int, default=1, help='number of processes to run positions in')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    start = time.time()
+    results = RunSuite(LoadSuite(args.suite), args.depth, args.workers)
+    wall_time = time.time() - start
+
+    PrintResults(results, wall_time)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'date': datetime.datetime.now().isoformat(timespec='seconds'), 'depth': args.depth,
+                       'workers': args.workers, 'wall_time': wall_time,
+                       'nodes': sum(result['nodes'] for result in results),
+                       'passed': all(result['passed'] for result in results), 'results': results}, f, indent=2)
+
+    sys.exit(0 if all(result['passed'] for result in results) else 1)
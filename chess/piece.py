@@ -1,7 +1,7 @@
 
 """
-piece class that contains information about the piece type, square, pinned mask (changes based on whether or not it is pinned)
-name, colour, pinned mask,  
+piece class that contains information about the piece type and square
+name, colour, square
 """
 
 class Piece:
@@ -9,8 +9,6 @@ class Piece:
         self.name = name
         self.colour = "w" if self.name.isupper() else "b"
         self.square : int  = square
-        self.pinned_mask = (2**64) - 1
-        self.times_moved : int = 0
         self.promoted = False
 
 
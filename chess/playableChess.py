@@ -5,6 +5,9 @@ from chessLogic import ChessLogic
 from render import Render, TOP_X, TOP_Y, SQUARE_SIZE
 from engine import Engine
 
+# seconds the engine gets to think, so the board doesn't freeze for long on AI turns
+AI_MOVE_TIME = 2
+
 class PlayableChess:
     def __init__(self, starting_fen="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", play="T"):
         self.logic = ChessLogic(starting_fen)
@@ -31,19 +34,19 @@ class PlayableChess:
         if (0 <= x <= 7) and (0 <= y <= 7):
             square = 8*y + x
 
-            piece = list(filter(lambda piece : piece.square == square, self.logic.board.pieces))
+            piece = self.logic.board.GetPieceOnSquare(int(square))
 
-            if self.logic.dragging and len(piece) == 0:
+            if self.logic.dragging and piece is None:
                 return int(square)
-            elif len(piece) != 0:
-                return piece[0]
+            elif piece is not None:
+                return piece
             
         else:
             return None
 
     def MakeMove(self, move):
-        # makes move and updates renderer
-        self.logic.MakeMove(move)
+        # makes move (a decoded Move object) and updates renderer
+        self.logic.MakeMove(move.code)
         self.render.UpdateRenderer(self.logic)
 
     def UnmakeMove(self):
@@ -69,10 +72,10 @@ class PlayableChess:
 
         self.logic.board.PrintBoard(size)
 
-        if self.logic.board.active_piece == "b" and len(self.logic.moveGen.possible_moves) != 0 and self.play == "A":
+        if self.logic.board.active_piece == "b" and len(self.logic.GetLegalMoves()) != 0 and self.play == "A":
 
             try:
-                move = self.engine.BestMove()
+                move = self.logic.DecodeMove(self.engine.BestMove(time_limit=AI_MOVE_TIME))
 
                 print(f"{move.piece.name} {self.logic.NumbertoAlgebraic(move.initial)} {self.logic.NumbertoAlgebraic(move.dest)} {move.type}")
                 self.MakeMove(move)
@@ -103,7 +106,7 @@ class PlayableChess:
                 move_type = move[3]
 
                 the_move = list(filter(lambda move: move.piece.name == piece_type and self.logic.IsAllyPiece(piece_type) and move.initial == initial_sq and 
-                move.dest == dest_sq and move.type == move_type, self.logic.moveGen.possible_moves))
+                move.dest == dest_sq and move.type == move_type, self.logic.GetDecodedMoves()))
 
                 while len(the_move) == 0 and move != 'Q':
                     # is the entered move valid?
@@ -120,7 +123,7 @@ class PlayableChess:
                         move_type = move[3]
 
                         the_move = list(filter(lambda move: move.piece.name == piece_type and self.logic.IsAllyPiece(piece_type) and move.initial == initial_sq and 
-                        move.dest == dest_sq and move.type == move_type, self.logic.moveGen.possible_moves))
+                        move.dest == dest_sq and move.type == move_type, self.logic.GetDecodedMoves()))
                 
                 if move == 'Q':
                     self.console_based_run = False
@@ -129,9 +132,9 @@ class PlayableChess:
                     self.MakeMove(the_move[0])
 
     def VisualBoard(self):
-        if self.logic.board.active_piece == "b" and len(self.logic.moveGen.possible_moves) != 0 and self.play == "A":
+        if self.logic.board.active_piece == "b" and len(self.logic.GetLegalMoves()) != 0 and self.play == "A":
             try:
-                move = self.engine.BestMove()
+                move = self.logic.DecodeMove(self.engine.BestMove(time_limit=AI_MOVE_TIME))
 
                 print(f"{move.piece.name} {self.logic.NumbertoAlgebraic(move.initial)} {self.logic.NumbertoAlgebraic(move.dest)} {move.type}")
                 self.MakeMove(move)
@@ -162,7 +165,7 @@ class PlayableChess:
                             """
                             which of the possible moves are possible for the piece being dragged?
                             """
-                            self.logic.drag_piece_moves = list(filter(lambda move : move.initial == self.logic.drag_piece.square, self.logic.moveGen.possible_moves))
+                            self.logic.drag_piece_moves = list(filter(lambda move : move.initial == self.logic.drag_piece.square, self.logic.GetDecodedMoves()))
 
                 
                         if self.logic.IsAllyPiece(self.logic.drag_piece.name):
@@ -0,0 +1,255 @@
+"""
+Reference move generator
+
+a deliberately simple generator to check the fast one against. The board is a list of 64 piece letters, moves are
+found by walking squares as (rank, file) pairs so nothing can wrap around the board edge, and legality is decided the
+obvious way: make the move on a copy and see if the king can be captured. Slow, but easy to convince yourself it's
+right.
+
+squares follow the rest of the board: square 0 is a8, square 63 is h1. Moves are uci strings, e.g. e2e4, e7e8q
+"""
+
+KNIGHT_STEPS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_STEPS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+STRAIGHT = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+DIAGONAL = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+def SquareName(sq):
+    return f"{chr(sq % 8 + 97)}{8 - sq // 8}"
+
+
+def SquareIndex(name):
+    return 8 * (8 - int(name[1])) + ord(name[0]) - 97
+
+
+def Colour(piece):
+    return 'w' if piece.isupper() else 'b'
+
+
+class Position:
+    def __init__(self, fen):
+        placement, self.side, castling, ep, halfmove, fullmove = fen.split()
+
+        self.squares = []
+
+        for rank in placement.split('/'):
+            for char in rank:
+                self.squares += ['.'] * int(char) if char.isdigit() else [char]
+
+        self.castling = '' if castling == '-' else castling
+        self.ep = None if ep == '-' else SquareIndex(ep)
+        self.halfmove = int(halfmove)
+        self.fullmove = int(fullmove)
+
+    def Fen(self):
+        ranks = []
+
+        for r in range(8):
+            rank, empty = '', 0
+
+            for piece in self.squares[8 * r: 8 * r + 8]:
+                if piece == '.':
+                    empty += 1
+                else:
+                    rank += (str(empty) if empty else '') + piece
+                    empty = 0
+
+            ranks.append(rank + (str(empty) if empty else ''))
+
+        ep = '-' if self.ep is None else SquareName(self.ep)
+
+        return f"{'/'.join(ranks)} {self.side} {self.castling or '-'} {ep} {self.halfmove} {self.fullmove}"
+
+    def Copy(self):
+        position = Position.__new__(Position)
+        position.squares = self.squares[:]
+        position.side, position.castling, position.ep = self.side, self.castling, self.ep
+        position.halfmove, position.fullmove = self.halfmove, self.fullmove
+
+        return position
+
+    def IsAttacked(self, sq, by):
+        """
+        can a piece of colour by capture on sq
+        """
+        r, f = divmod(sq, 8)
+
+        def At(dr, df):
+            if 0 <= r + dr < 8 and 0 <= f + df < 8:
+                piece = self.squares[8 * (r + dr) + f + df]
+
+                if piece != '.' and Colour(piece) == by:
+                    return piece.upper()
+
+            return None
+
+        # a white pawn attacks from the rank below (higher index), a black pawn from the rank above
+        pawn_rank = 1 if by == 'w' else -1
+
+        if At(pawn_rank, -1) == 'P' or At(pawn_rank, 1) == 'P':
+            return True
+
+        if any(At(dr, df) == 'N' for dr, df in KNIGHT_STEPS) or any(At(dr, df) == 'K' for dr, df in KING_STEPS):
+            return True
+
+        for directions, sliders in ((STRAIGHT, 'RQ'), (DIAGONAL, 'BQ')):
+            for dr, df in directions:
+                rr, ff = r + dr, f + df
+
+                while 0 <= rr < 8 and 0 <= ff < 8:
+                    piece = self.squares[8 * rr + ff]
+
+                    if piece != '.':
+                        if Colour(piece) == by and piece.upper() in sliders:
+                            return True
+                        break
+
+                    rr, ff = rr + dr, ff + df
+
+        return False
+
+    def InCheck(self, side):
+        king = self.squares.index('K' if side == 'w' else 'k')
+
+        return self.IsAttacked(king, 'b' if side == 'w' else 'w')
+
+    def PseudoLegalMoves(self):
+        moves = []
+        enemy = 'b' if self.side == 'w' else 'w'
+
+        for sq, piece in enumerate(self.squares):
+            if piece == '.' or Colour(piece) != self.side:
+                continue
+
+            r, f = divmod(sq, 8)
+            kind = piece.upper()
+
+            def Target(rr, ff):
+                # '.' for empty, 'x' for an enemy piece, None for off the board or an ally piece
+                if not (0 <= rr < 8 and 0 <= ff < 8):
+                    return None
+
+                target = self.squares[8 * rr + ff]
+
+                if target == '.':
+                    return '.'
+
+                return 'x' if Colour(target) == enemy else None
+
+            if kind == 'P':
+                forward = -1 if self.side == 'w' else 1
+                start_rank, last_rank = (6, 0) if self.side == 'w' else (1, 7)
+                targets = []
+
+                if Target(r + forward, f) == '.':
+                    targets.append(8 * (r + forward) + f)
+
+                    if r == start_rank and Target(r + 2 * forward, f) == '.':
+                        targets.append(8 * (r + 2 * forward) + f)
+
+                for df in (-1, 1):
+                    to = 8 * (r + forward) + f + df
+
+                    if Target(r + forward, f + df) == 'x' or (0 <= f + df < 8 and to == self.ep):
+                        targets.append(to)
+
+                for to in targets:
+                    if to // 8 == last_rank:
+                        moves += [SquareName(sq) + SquareName(to) + promotion for promotion in 'nbrq']
+                    else:
+                        moves.append(SquareName(sq) + SquareName(to))
+
+            elif kind in 'NK':
+                for dr, df in (KNIGHT_STEPS if kind == 'N' else KING_STEPS):
+                    if Target(r + dr, f + df) is not None:
+                        moves.append(SquareName(sq) + SquareName(8 * (r + dr) + f + df))
+
+            else:
+                directions = {'R': STRAIGHT, 'B': DIAGONAL, 'Q': STRAIGHT + DIAGONAL}[kind]
+
+                for dr, df in directions:
+                    rr, ff = r + dr, f + df
+
+                    while Target(rr, ff) is not None:
+                        moves.append(SquareName(sq) + SquareName(8 * rr + ff))
+
+                        if Target(rr, ff) == 'x':
+                            break
+
+                        rr, ff = rr + dr, ff + df
+
+        # castling: rights, king and rook in place, empty between, king not in check or passing an attacked square
+        if self.side == 'w':
+            castles = (('K', 60, 63, 62, [61, 62], [60, 61, 62]), ('Q', 60, 56, 58, [57, 58, 59], [60, 59, 58]))
+            king, rook = 'K', 'R'
+        else:
+            castles = (('k', 4, 7, 6, [5, 6], [4, 5, 6]), ('q', 4, 0, 2, [1, 2, 3], [4, 3, 2]))
+            king, rook = 'k', 'r'
+
+        for right, king_sq, rook_sq, to, empty, safe in castles:
+            if right in self.castling and self.squares[king_sq] == king and self.squares[rook_sq] == rook:
+                if all(self.squares[s] == '.' for s in empty) and not any(self.IsAttacked(s, enemy) for s in safe):
+                    moves.append(SquareName(king_sq) + SquareName(to))
+
+        return moves
+
+    def Make(self, move):
+        """
+        position after move, as a new Position
+        """
+        position = self.Copy()
+        squares = position.squares
+
+        from_sq, to_sq = SquareIndex(move[:2]), SquareIndex(move[2:4])
+        piece = squares[from_sq]
+        captured = squares[to_sq]
+
+        squares[from_sq] = '.'
+        squares[to_sq] = piece
+
+        if piece.upper() == 'P':
+            if to_sq == self.ep:
+                # en-passant, the captured pawn is beside the moving pawn
+                squares[8 * (from_sq // 8) + to_sq % 8] = '.'
+                captured = 'p'
+
+            if len(move) == 5:
+                squares[to_sq] = move[4].upper() if self.side == 'w' else move[4]
+
+        if piece.upper() == 'K' and abs(to_sq - from_sq) == 2:
+            # castling, move the rook to the other side of the king
+            rook_from, rook_to = (to_sq + 1, to_sq - 1) if to_sq > from_sq else (to_sq - 2, to_sq + 1)
+            squares[rook_to] = squares[rook_from]
+            squares[rook_from] = '.'
+
+        # rights are lost when the king or rook leaves its square, or the rook is captured on it
+        for right, sq in (('K', 60), ('Q', 60), ('K', 63), ('Q', 56), ('k', 4), ('q', 4), ('k', 7), ('q', 0)):
+            if sq in (from_sq, to_sq):
+                position.castling = position.castling.replace(right, '')
+
+        position.ep = (from_sq + to_sq) // 2 if piece.upper() == 'P' and abs(to_sq - from_sq) == 16 else None
+        position.halfmove = 0 if piece.upper() == 'P' or captured != '.' else self.halfmove + 1
+        position.fullmove = self.fullmove + (self.side == 'b')
+        position.side = 'b' if self.side == 'w' else 'w'
+
+        return position
+
+    def LegalMoves(self):
+        return [move for move in self.PseudoLegalMoves() if not self.Make(move).InCheck(self.side)]
+
+
+def Perft(position, depth):
+    if depth == 0:
+        return 1
+
+    return sum(Perft(position.Make(move), depth - 1) for move in position.LegalMoves())
+
+
+def Divide(fen, depth):
+    """
+    {move: perft of the position after it}
+    """
+    position = Position(fen)
+
+    return {move: Perft(position.Make(move), depth - 1) for move in position.LegalMoves()}
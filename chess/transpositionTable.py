@@ -0,0 +1,136 @@
+"""
+Transposition table
+
+fixed size hash table of search results, keyed by zobrist hash. Entries are packed into two flat arrays of 64-bit
+ints, keys and data, instead of a dict of objects, so the table's memory is set up front and stays put.
+
+Entries are grouped in buckets of two. The first slot is depth-preferred: it keeps the deepest result unless that
+result is from an earlier search. The second slot is always replaced, so recent results aren't lost either.
+
+data layout:
+
+15:0 -> best move, 0 if none
+23:16 -> depth
+25:24 -> bound
+31:26 -> generation, the search the entry was stored in
+63:32 -> score, offset to be positive
+"""
+from array import array
+
+EXACT, LOWER, UPPER = 1, 2, 3 # exact score, score is at least (fail high), score is at most (fail low)
+
+ENTRY_BYTES = 16 # 8 for the key, 8 for the data
+SCORE_OFFSET = 1 << 31
+GENERATIONS = 64
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16):
+        # number of buckets is a power of 2 so that the index is a mask of the hash
+        buckets = max(1, size_mb * 2**20 // (2 * ENTRY_BYTES))
+        self.bucket_mask = (1 << (buckets.bit_length() - 1)) - 1
+
+        self.keys = array('Q', [0]) * (2 * (self.bucket_mask + 1))
+        self.data = array('Q', [0]) * (2 * (self.bucket_mask + 1))
+
+        self.generation = 0
+
+    def Clear(self):
+        self.keys = array('Q', [0]) * len(self.keys)
+        self.data = array('Q', [0]) * len(self.data)
+
+        self.generation = 0
+
+    def NewSearch(self):
+        """
+        age existing entries, so they give way to the new search's results in the depth-preferred slot
+        """
+        self.generation = (self.generation + 1) % GENERATIONS
+
+    def Probe(self, key):
+        """
+        (depth, score, bound, move) stored for key, or None
+        """
+        slot = 2 * (key & self.bucket_mask)
+
+        for i in (slot, slot + 1):
+            if self.keys[i] == key:
+                data = self.data[i]
+
+                return (data >> 16) & 0xff, (data >> 32) - SCORE_OFFSET, (data >> 24) & 3, data & 0xffff
+
+        return None
+
+    def Store(self, key, depth, score, bound, move):
+        slot = 2 * (key & self.bucket_mask)
+        data = move | (depth << 16) | (bound << 24) | (self.generation << 26) | ((score + SCORE_OFFSET) << 32)
+
+        stored = self.data[slot]
+
+        # depth-preferred slot takes the entry if it's the same position, older, or not as deep
+        if self.keys[slot] == key or (stored >> 26) & 63 != self.generation or depth >= (stored >> 16) & 0xff:
+            if self.keys[slot] != key and self.keys[slot] != 0:
+                # move the entry being replaced into the always-replace slot rather than losing it
+                self.keys[slot + 1] = self.keys[slot]
+                self.data[slot + 1] = stored
+
+            self.keys[slot] = key
+            self.data[slot] = data
+        else:
+            self.keys[slot + 1] = key
+            self.data[slot + 1] = data
+
+    def Hashfull(self):
+        """
+        permille of sampled entries filled in by the current search
+        """
+        sample = min(1000, len(self.keys))
+
+        return sum(1 for i in range(sample) if self.keys[i] != 0 and (self.data[i] >> 26) & 63 == self.generation) * 1000 // sample
+
+
+class PerftTable:
+    """
+    node counts of perft subtrees, keyed by (zobrist hash, remaining depth). One always-replace entry per slot, in
+    the same flat array layout as the transposition table
+
+    data layout:
+
+    7:0 -> depth
+    63:8 -> node count
+    """
+    def __init__(self, size_mb=16):
+        slots = max(1, size_mb * 2**20 // ENTRY_BYTES)
+        self.mask = (1 << (slots.bit_length() - 1)) - 1
+
+        self.keys = array('Q', [0]) * (self.mask + 1)
+        self.data = array('Q', [0]) * (self.mask + 1)
+
+        self.hits = 0
+        self.misses = 0
+
+    def Probe(self, key, depth):
+        """
+        node count stored for key at depth, or None
+        """
+        # depths spread over neighbouring slots, so the same position at different depths doesn't fight for one slot
+        slot = (key + depth) & self.mask
+        data = self.data[slot]
+
+        if self.keys[slot] == key and data & 0xff == depth:
+            self.hits += 1
+            return data >> 8
+
+        self.misses += 1
+        return None
+
+    def Store(self, key, depth, nodes):
+        slot = (key + depth) & self.mask
+
+        self.keys[slot] = key
+        self.data[slot] = (nodes << 8) | depth
+
+    def HitRate(self):
+        probes = self.hits + self.misses
+
+        return self.hits / probes if probes else 0
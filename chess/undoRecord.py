@@ -0,0 +1,20 @@
+"""
+Undo information for one ply.
+
+MakeMove fills in the state that can't be worked out from the move itself, UnmakeMove puts it back. Records live on
+a stack that is allocated once and reused, so making and unmaking moves doesn't allocate
+"""
+
+MAX_PLY = 256
+
+class UndoRecord:
+    __slots__ = ('captured_piece', 'castling_rights', 'ep_square', 'halfmove_clock', 'possible_moves', 'attackers', 'hash')
+
+    def __init__(self):
+        self.captured_piece = None # name of the captured piece, or None
+        self.castling_rights = 0
+        self.ep_square = None
+        self.halfmove_clock = 0
+        self.possible_moves = None # legal moves of the position before the move, if they had been generated
+        self.attackers = 0 # pieces giving check in the position before the move
+        self.hash = 0 # zobrist key of the position before the move
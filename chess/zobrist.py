@@ -0,0 +1,58 @@
+"""
+Zobrist keys
+
+a position's hash is the XOR of a random 64-bit key for every (piece, square) on the board, one for black to move,
+one for the castling rights and one for the en-passant file. The en-passant file is only hashed when a pawn can take
+en passant, otherwise the position is no different from one without the right and should transpose to it. Any change to the position is undone by XORing the same
+key again, so make/unmake keep the hash up to date with a few XORs instead of rehashing the board.
+
+Keys come from a fixed seed, so a position hashes the same in every run and every process
+"""
+import random
+
+_rng = random.Random(0x5EED)
+
+# indexed by piece code (see classicalBitboard.PIECE_CODES), then square
+PIECE_KEYS = [[_rng.getrandbits(64) for _ in range(64)] for _ in range(12)]
+SIDE_KEY = _rng.getrandbits(64) # black to move
+CASTLING_KEYS = [_rng.getrandbits(64) for _ in range(16)] # indexed by the 4 castling right bits
+EP_FILE_KEYS = [_rng.getrandbits(64) for _ in range(8)]
+
+
+def EPKey(board, pawn_table):
+    """
+    key of the en-passant file, 0 unless a pawn of the side to move attacks the en-passant square. pawn_table: squares
+    a pawn of each colour attacks, see GenerateMoves.PAWN_TABLE
+    """
+    ep_square = board.ep_square
+
+    if ep_square is None:
+        return 0
+
+    # a pawn attacks the square an enemy pawn on it would attack
+    if board.active_piece == 'w':
+        capturers = pawn_table['b'][ep_square] & int(board.white_pawns)
+    else:
+        capturers = pawn_table['w'][ep_square] & int(board.black_pawns)
+
+    return EP_FILE_KEYS[ep_square % 8] if capturers else 0
+
+
+def ComputeHash(board, pawn_table):
+    """
+    hash of the board from scratch, for setting up a position and for checking the incremental hash
+    """
+    h = 0
+
+    for code, bb in enumerate(board.bitboards):
+        bb = int(bb)
+
+        while bb:
+            lsb = bb & -bb
+            h ^= PIECE_KEYS[code][64 - lsb.bit_length()]
+            bb ^= lsb
+
+    if board.active_piece == 'b':
+        h ^= SIDE_KEY
+
+    return h ^ CASTLING_KEYS[board.castling_rights] ^ EPKey(board, pawn_table)